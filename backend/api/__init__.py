@@ -1,6 +1,6 @@
 """
 API Routes Package
 """
-from backend.api import predictions, feedback, analytics
+from backend.api import predictions, feedback, analytics, registry
 
-__all__ = ["predictions", "feedback", "analytics"]
\ No newline at end of file
+__all__ = ["predictions", "feedback", "analytics", "registry"]
\ No newline at end of file
@@ -2,44 +2,140 @@
 Analytics API Endpoints
 """
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Literal, Optional
 import logging
 
-from backend.database import get_db
+from backend.database import get_async_db
+from backend.core.cache import cache_stats
 from backend.core.security import get_current_user
-from backend.models.prediction import PredictionLog
-from backend.models.feedback import UserFeedback
 from backend.services.model_service import get_model_manager
+from backend.services.analytics_aggregates import query_timeseries, to_naive_utc
+from backend.services.analytics_rollups import get_rollup, get_rollup_versions, rebuild_rollups
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 logger = logging.getLogger(__name__)
 
 @router.get("/model-metrics")
 async def get_model_metrics(
-    user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    model_version: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
 ):
-    """Get model performance metrics"""
+    """
+    Get model performance metrics
+    
+    Read from the incrementally maintained rollups of the given version
+    (the active one by default), so the cost does not grow with the logs.
+    """
     try:
         model_manager = get_model_manager()
-        total_predictions = db.query(PredictionLog).count()
-        feedbacks = db.query(UserFeedback).count()
-        
-        # Calculate accuracy from feedback
-        correct_predictions = db.query(UserFeedback).filter(
-            UserFeedback.correct_class == PredictionLog.predicted_class
-        ).count() if feedbacks > 0 else 0
-        
-        accuracy = correct_predictions / feedbacks if feedbacks > 0 else 1.0
+        metrics = await get_rollup(model_version or model_manager.model_version)
         
         return {
-            "model_version": model_manager.model_version,
-            "total_predictions": total_predictions,
-            "user_feedbacks": feedbacks,
-            "estimated_accuracy": accuracy,
+            **metrics,
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
         logger.error(f"Analytics error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/model-metrics/versions")
+async def list_metric_versions(user_id: str = Depends(get_current_user)):
+    """Model versions with recorded metrics"""
+    return {"versions": await get_rollup_versions()}
+
+@router.post("/model-metrics/rebuild")
+async def rebuild_model_metrics(
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Recompute the metric rollups from the prediction and feedback tables"""
+    try:
+        versions = await rebuild_rollups(db)
+        return {"message": "Rollups rebuilt", "versions": versions}
+    except Exception as e:
+        logger.error(f"Rollup rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Window returned when the request gives no start
+DEFAULT_TIMESERIES_WINDOW = {"hour": timedelta(days=2), "day": timedelta(days=90)}
+
+@router.get("/timeseries")
+async def get_timeseries(
+    granularity: Literal["hour", "day"] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    model_version: Optional[str] = None,
+    region: Optional[str] = None,
+    predicted_class: Optional[str] = None,
+    group_by: Optional[Literal["predicted_class", "severity", "region", "model_version"]] = None,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Prediction counts, mean confidence and feedback accuracy per time bucket
+    
+    group_by=predicted_class gives the class distribution and
+    group_by=severity the severity mix. Served from the pre-aggregated
+    buckets, which trail the logs by up to one aggregation interval.
+    """
+    try:
+        end = to_naive_utc(end) if end else datetime.utcnow()
+        start = to_naive_utc(start) if start else end - DEFAULT_TIMESERIES_WINDOW[granularity]
+        points = await query_timeseries(
+            db, granularity, start, end,
+            model_version=model_version,
+            region=region,
+            predicted_class=predicted_class,
+            group_by=group_by
+        )
+        return {
+            "granularity": granularity,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "group_by": group_by,
+            "points": points
+        }
+    except Exception as e:
+        logger.error(f"Timeseries error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/drift")
+async def get_drift(
+    reference: Literal["baseline", "window"] = "baseline",
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Drift of the active model's recent predictions
+    
+    Compares the current sliding window against the baseline or the window
+    before it. Sketches are kept per API worker, so each worker reports on
+    the traffic it served.
+    """
+    loaded = get_model_manager().active
+    if loaded is None or loaded.drift_monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring is not enabled")
+    report = loaded.drift_monitor.detect_streaming_drift(reference)
+    return {
+        "model_version": loaded.version,
+        **report,
+        "total_predictions": loaded.drift_monitor.streaming.total_predictions
+    }
+
+@router.post("/drift/baseline")
+async def reset_drift_baseline(user_id: str = Depends(get_current_user)):
+    """Use the current window of this worker as the drift baseline"""
+    loaded = get_model_manager().active
+    if loaded is None or loaded.drift_monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring is not enabled")
+    loaded.drift_monitor.streaming.set_baseline()
+    return {"message": "Drift baseline set", "model_version": loaded.version}
+
+@router.get("/cache")
+async def get_cache_stats(user_id: str = Depends(get_current_user)):
+    """Prediction cache counters for the worker serving this request"""
+    return {
+        **cache_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
\ No newline at end of file
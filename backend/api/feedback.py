@@ -1,37 +1,75 @@
 """
 Feedback API Endpoints
 """
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy import String, case, column, insert, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, Optional, Tuple
 import uuid
 import logging
 
-from backend.database import get_db
+from backend.config import CLASS_NAMES, RETRAINING_THRESHOLD
+from backend.database import get_async_db, async_engine
+from backend.core.executors import run_blocking
 from backend.core.security import get_current_user
-from backend.schemas.feedback import FeedbackRequest, FeedbackResponse
+from backend.schemas.feedback import FeedbackRequest, FeedbackResponse, BulkFeedbackRequest, BulkFeedbackResponse
 from backend.models.feedback import UserFeedback
 from backend.models.prediction import PredictionLog
+from backend.services.analytics_rollups import record_feedbacks
+from workers.celery_tasks import submit_retraining_job
 
 router = APIRouter(prefix="/feedback", tags=["feedback"])
 logger = logging.getLogger(__name__)
 
-def check_retraining_needed(db: Session):
-    """Background task to check if model needs retraining"""
+VALID_CLASSES = frozenset(CLASS_NAMES)
+
+async def _account_feedback(entries: Iterable[Tuple[Optional[str], str, str]]):
+    """
+    Add (model_version, predicted_class, correct_class) feedbacks to the rollups
+    
+    Their per-version feedback counter also drives the retraining trigger.
+    """
     try:
-        from backend.config import RETRAINING_THRESHOLD
-        feedback_count = db.query(UserFeedback).count()
-        if feedback_count >= RETRAINING_THRESHOLD:
-            logger.info("Retraining threshold reached. Triggering retraining...")
-            # Implement retraining logic or send notification
+        counts = await record_feedbacks(entries)
+        for model_version, feedback_count in counts.items():
+            if feedback_count >= RETRAINING_THRESHOLD:
+                await run_blocking(submit_retraining_job, model_version, feedback_count)
     except Exception as e:
-        logger.error(f"Retraining check error: {e}")
+        logger.error(f"Feedback accounting failed: {e}")
+
+def _apply_corrections(corrections: Dict[str, str]):
+    """
+    One UPDATE setting corrected_class on every prediction in corrections
+    
+    Postgres joins against the corrections as a VALUES list; other dialects
+    (SQLite in development) lack column aliases there and use a CASE instead.
+    """
+    if async_engine.dialect.name == "postgresql":
+        corrections_table = values(
+            column("id", String), column("corrected_class", String), name="corrections"
+        ).data(list(corrections.items()))
+        statement = (
+            update(PredictionLog)
+            .where(PredictionLog.id == corrections_table.c.id)
+            .values(corrected_class=corrections_table.c.corrected_class)
+        )
+    else:
+        statement = (
+            update(PredictionLog)
+            .where(PredictionLog.id.in_(list(corrections)))
+            .values(corrected_class=case(corrections, value=PredictionLog.id))
+        )
+    return (
+        statement
+        .returning(PredictionLog.id, PredictionLog.model_version, PredictionLog.predicted_class)
+        .execution_options(synchronize_session=False)
+    )
 
 @router.post("/", response_model=FeedbackResponse)
 async def submit_feedback(
     feedback: FeedbackRequest,
     user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = None
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Submit feedback for active learning
@@ -47,17 +85,19 @@ async def submit_feedback(
         db.add(feedback_entry)
         
         # Update prediction log
-        pred_log = db.query(PredictionLog).filter(
-            PredictionLog.id == feedback.prediction_id
-        ).first()
-        if pred_log:
-            pred_log.corrected_class = feedback.correct_class
+        result = await db.execute(
+            update(PredictionLog)
+            .where(PredictionLog.id == feedback.prediction_id)
+            .values(corrected_class=feedback.correct_class)
+            .returning(PredictionLog.model_version, PredictionLog.predicted_class)
+        )
+        logged = result.first()
         
-        db.commit()
+        await db.commit()
         
-        # Trigger retraining check in background
-        if background_tasks:
-            background_tasks.add_task(check_retraining_needed, db)
+        # Update analytics rollups against the prediction this feedback refers to
+        if logged is not None:
+            await _account_feedback([(logged.model_version, logged.predicted_class, feedback.correct_class)])
         
         return FeedbackResponse(
             message="Feedback received",
@@ -66,4 +106,62 @@ async def submit_feedback(
     except Exception as e:
         logger.error(f"Feedback error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    
\ No newline at end of file
+    
+
+@router.post("/bulk", response_model=BulkFeedbackResponse)
+async def submit_bulk_feedback(
+    request: BulkFeedbackRequest,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Submit many corrections at once (dashboard review)
+    
+    All feedback rows go in with one multi-row insert and all prediction
+    logs are corrected with one set-based update, in a single transaction.
+    """
+    invalid = [
+        {"index": i, "correct_class": item.correct_class}
+        for i, item in enumerate(request.items)
+        if item.correct_class not in VALID_CLASSES
+    ]
+    if invalid:
+        raise HTTPException(status_code=422, detail={"message": "Unknown correct_class", "items": invalid})
+    
+    try:
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "prediction_id": item.prediction_id,
+                "user_id": user_id,
+                "correct_class": item.correct_class,
+                "comments": item.comments
+            }
+            for item in request.items
+        ]
+        await db.execute(insert(UserFeedback), rows)
+        
+        # The last correction of a prediction wins, as with sequential submissions
+        corrections = {item.prediction_id: item.correct_class for item in request.items}
+        logged = {
+            row.id: row
+            for row in await db.execute(_apply_corrections(corrections))
+        }
+        
+        await db.commit()
+        
+        await _account_feedback(
+            (logged[item.prediction_id].model_version, logged[item.prediction_id].predicted_class, item.correct_class)
+            for item in request.items
+            if item.prediction_id in logged
+        )
+        
+        return BulkFeedbackResponse(
+            message="Feedback received",
+            feedback_ids=[row["id"] for row in rows],
+            updated_predictions=len(logged),
+            unknown_prediction_ids=[prediction_id for prediction_id in corrections if prediction_id not in logged]
+        )
+    except Exception as e:
+        logger.error(f"Bulk feedback error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
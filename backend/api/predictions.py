@@ -1,125 +1,463 @@
 """
 Prediction API Endpoints
 """
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
-from sqlalchemy.orm import Session
-from PIL import Image
-import io
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query
+from fastapi.responses import Response, StreamingResponse
+from typing import List, Literal, Optional, Tuple
+import asyncio
+import numpy as np
+import orjson
 import json
 import uuid
 from datetime import datetime
 import logging
 
-from backend.database import get_db
 from backend.core.security import get_current_user
-from backend.core.cache import get_redis_client
-from backend.schemas.prediction import PredictionResponse
-from backend.services.model_service import get_model_manager
+from backend.dependencies import require_ready
+from backend.core.cache import (
+    content_hash, prediction_cache_key, SingleFlight,
+    cache_get, cache_set, cache_get_many, cache_set_many
+)
+from backend.core.executors import run_decode, run_inference, run_blocking
+from backend.schemas.prediction import PredictionRequest, PredictionResponse
+from backend.services.model_service import get_model_manager, LoadedModel, SchedulerStoppedError
 from backend.services.treatment_service import get_treatment_suggestions
-from backend.services.explainability import generate_explainability_map
-from backend.models.prediction import PredictionLog
-from backend.config import CLASS_NAMES
+from backend.services.explainability import explainability_payload
+from backend.services.preprocessing import load_image_tensor, INPUT_SHAPE
+from backend.services.prediction_log_writer import get_prediction_log_writer
+from backend.services.image_store import get_image_store_writer, image_key
+from workers.celery_tasks import submit_explainability_jobs, get_explainability_job
+from backend.config import (
+    CLASS_NAMES, PREDICTION_CACHE_TTL, INFERENCE_MAX_BATCH_SIZE, BATCH_PREDICT_MAX_FILES,
+    EXPLAINABILITY_HEATMAP_ENCODING
+)
 
-router = APIRouter(prefix="/predict", tags=["predictions"])
+router = APIRouter(prefix="/predict", tags=["predictions"], dependencies=[Depends(require_ready)])
 logger = logging.getLogger(__name__)
 
+# Coalesces concurrent identical uploads within this worker
+prediction_flight = SingleFlight()
+
+# Response field carrying the probabilities for each probability_format
+PROBABILITY_FIELDS = {"dict": "all_probabilities", "array": "probabilities", "top_k": "top_predictions"}
+
+def _model_output(
+    predicted_class: str,
+    confidence: float,
+    probabilities,
+    treatments: Optional[list],
+    explainability: Optional[dict],
+    options: PredictionRequest
+) -> dict:
+    """
+    The part of a prediction response shared by every request for the same image
+
+    It only depends on the image, the model version and the response
+    options, which is what the cache key covers, so this is what gets cached
+    and handed to coalesced callers. The shared response fields are
+    serialized once here ("body"); a cache hit splices that JSON into its
+    response as is instead of decoding and re-encoding the probabilities.
+    Everything tied to one request is added by _finish_prediction.
+    """
+    return {
+        "predicted_class": predicted_class,
+        "confidence": confidence,
+        "body": orjson.dumps({
+            "predicted_class": predicted_class,
+            "confidence": confidence,
+            PROBABILITY_FIELDS[options.probability_format]: probabilities,
+            "treatment_suggestions": treatments,
+            "explainability": explainability
+        })
+    }
+
+async def _explain(
+    loaded: LoadedModel,
+    images: np.ndarray,
+    predicted_classes: List[str],
+    mode: str = "sync",
+    image_keys: Optional[List[str]] = None
+) -> List[Optional[dict]]:
+    """
+    Grad-CAM payloads for a batch of preprocessed images, None where unavailable
+
+    In async mode the heatmaps are computed by a Celery worker from the
+    stored images (image_keys) and each payload only carries the job id to poll.
+    """
+    if mode == "async":
+        try:
+            job_ids = await run_blocking(submit_explainability_jobs, image_keys, loaded.version, predicted_classes)
+        except Exception as e:
+            logger.error(f"Error submitting explainability jobs: {e}")
+            return [None] * len(predicted_classes)
+        return [
+            {
+                "status": "pending",
+                "job_id": job_id,
+                "method": "grad_cam",
+                "result_url": f"{router.prefix}/explainability/{job_id}"
+            }
+            for job_id in job_ids
+        ]
+    
+    if not loaded.supports_explainability:
+        return [None] * len(predicted_classes)
+    try:
+        heatmaps = await run_inference(
+            loaded.explain,
+            images,
+            [CLASS_NAMES.index(c) for c in predicted_classes]
+        )
+    except Exception as e:
+        logger.error(f"Error generating explainability map: {e}")
+        return [None] * len(predicted_classes)
+    return [
+        explainability_payload(heatmap, predicted_class, EXPLAINABILITY_HEATMAP_ENCODING)
+        for heatmap, predicted_class in zip(heatmaps, predicted_classes)
+    ]
+
+def _log_row(
+    prediction_id: str,
+    model_version: str,
+    user_id: str,
+    predicted_class: str,
+    confidence: float,
+    severity: str,
+    treatments: Optional[list],
+    meta_dict: dict,
+    image_path: str,
+    timestamp: datetime
+) -> dict:
+    """PredictionLog row keyed by column name, for the write-behind log writer"""
+    return {
+        "id": prediction_id,
+        "user_id": user_id,
+        "timestamp": timestamp,
+        "model_version": model_version,
+        "predicted_class": predicted_class,
+        "confidence": confidence,
+        "metadata": meta_dict,
+        "image_path": image_path,
+        "severity": severity,
+        "treatment_plan": treatments
+    }
+
+def _finish_prediction(
+    output: dict,
+    options: PredictionRequest,
+    user_id: str,
+    model_version: str,
+    image_path: str,
+    extra_metadata: Optional[dict] = None
+) -> Tuple[bytes, dict]:
+    """
+    Response body and PredictionLog row of one request for a model output
+
+    Each request, including cache hits and coalesced callers, gets its own
+    prediction id, timestamp, severity and metadata and its own log row, so
+    feedback and analytics see every request.
+
+    Every value is already a JSON-native type, so the per-request fields are
+    serialized straight to bytes with orjson instead of being validated and
+    dumped through Pydantic on the hot path, then joined with the
+    pre-serialized shared fields of the output.
+    """
+    meta_dict = options.metadata
+    prediction_id = str(uuid.uuid4())
+    timestamp = datetime.utcnow()
+    predicted_class = output["predicted_class"]
+    confidence = output["confidence"]
+    severity = get_model_manager().estimate_severity(predicted_class, confidence, meta_dict)
+    head = orjson.dumps({
+        "prediction_id": prediction_id,
+        "severity": severity,
+        "metadata": {
+            **meta_dict,
+            **(extra_metadata or {}),
+            "model_version": model_version,
+            "timestamp": timestamp.isoformat()
+        }
+    })
+    # Both are JSON objects with distinct keys: merge them into one
+    body = head[:-1] + b"," + output["body"][1:]
+    row = _log_row(
+        prediction_id,
+        model_version,
+        user_id,
+        predicted_class,
+        confidence,
+        severity,
+        get_treatment_suggestions(predicted_class) if options.include_treatment else None,
+        meta_dict,
+        image_path,
+        timestamp
+    )
+    return body, row
+
+def _cache_key(image_hash: str, model_version: str, options: PredictionRequest) -> str:
+    """Prediction cache key for an image under the given request options"""
+    return prediction_cache_key(
+        image_hash,
+        model_version,
+        options.include_treatment,
+        options.include_explainability,
+        options.explainability_mode == "async",
+        options.probability_format,
+        # Larger values return every class, so they share one entry
+        min(options.top_k, len(CLASS_NAMES))
+    )
+
+def _hash_all(contents: List[bytes]) -> List[str]:
+    return [content_hash(c) for c in contents]
+
+async def _compute_output(
+    contents: bytes,
+    stored_key: str,
+    options: PredictionRequest,
+    cache_key: str,
+    loaded: LoadedModel
+) -> dict:
+    """Run inference for one uploaded image and cache its model output"""
+    model_manager = get_model_manager()
+    
+    # Read and process image
+    processed_img = await run_decode(load_image_tensor, contents, loaded.backend.input_dtype)
+    
+    # Persist the upload in the background (stored once per distinct image)
+    await get_image_store_writer().submit(stored_key, contents)
+    
+    # Make prediction (micro-batched with concurrent requests on this model version)
+    predicted_class, confidence, probabilities = await model_manager.predict_tensor_async(
+        processed_img,
+        loaded,
+        options.probability_format,
+        # Larger values return every class, so they share one entry
+        min(options.top_k, len(CLASS_NAMES))
+    )
+    
+    # Get treatment suggestions
+    treatments = None
+    if options.include_treatment:
+        treatments = get_treatment_suggestions(predicted_class)
+    
+    # Generate explainability
+    explainability = None
+    if options.include_explainability:
+        # Reuses the tensor already preprocessed for inference
+        explainability = (await _explain(
+            loaded,
+            processed_img[np.newaxis],
+            [predicted_class],
+            options.explainability_mode,
+            [stored_key]
+        ))[0]
+    
+    output = _model_output(predicted_class, confidence, probabilities, treatments, explainability, options)
+    
+    # Cache result (a small msgpack envelope around the serialized response fields)
+    await cache_set(cache_key, output, PREDICTION_CACHE_TTL)
+    
+    return output
+
 @router.post("/", response_model=PredictionResponse)
 async def predict_disease(
     file: UploadFile = File(...),
     metadata: str = '{}',
     include_explainability: bool = False,
+    explainability_mode: Literal["sync", "async"] = "sync",
     include_treatment: bool = True,
-    user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    probability_format: Literal["dict", "array", "top_k"] = "dict",
+    top_k: int = Query(5, ge=1),
+    user_id: str = Depends(get_current_user)
 ):
     """
     Main prediction endpoint with metadata support
+    
+    With explainability_mode=async the prediction returns at once and the
+    Grad-CAM heatmap is fetched later from /predict/explainability/{job_id}.
+    probability_format returns every class as a dict (default), as an
+    array in CLASS_NAMES order, or only the top_k most likely classes.
     """
-    prediction_id = str(uuid.uuid4())
-    redis_client = get_redis_client()
-    model_manager = get_model_manager()
+    # Pin the active version so a concurrent hot swap cannot split this request across models
+    loaded = get_model_manager().active
     
     try:
-        # Parse metadata
-        meta_dict = json.loads(metadata)
+        options = PredictionRequest(
+            metadata=json.loads(metadata),
+            include_explainability=include_explainability,
+            explainability_mode=explainability_mode,
+            include_treatment=include_treatment,
+            probability_format=probability_format,
+            top_k=top_k
+        )
         
-        # Check cache
-        cache_key = f"prediction:{file.filename}"
-        cached = redis_client.get(cache_key)
-        if cached:
+        # Check cache (keyed on image content, model version and flags)
+        contents = await file.read()
+        image_hash = await run_blocking(content_hash, contents)
+        stored_key = image_key(image_hash)
+        cache_key = _cache_key(image_hash, loaded.version, options)
+        output = await cache_get(cache_key)
+        if output is not None:
             logger.info("Returning cached prediction")
-            return json.loads(cached)
+        else:
+            # Concurrent uploads of the same image share one inference
+            output = await prediction_flight.do(
+                cache_key,
+                lambda: _compute_output(contents, stored_key, options, cache_key, loaded)
+            )
         
-        # Read and process image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert('RGB')
+        body, log_row = _finish_prediction(output, options, user_id, loaded.version, stored_key)
         
-        # Make prediction
-        predicted_class, confidence, all_probs = model_manager.predict(image)
+        # Log prediction to database (written behind in bulk, off the response path)
+        await get_prediction_log_writer().submit(log_row)
+        return Response(content=body, media_type="application/json")
         
-        # Estimate severity
-        severity = model_manager.estimate_severity(predicted_class, confidence, meta_dict)
+    except SchedulerStoppedError:
+        # The pinned version was unloaded by a deploy while this request waited
+        raise HTTPException(status_code=503, detail="Model version was unloaded, retry the request")
+    except Exception as e:
+        logger.error(f"Prediction error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream_batch_predictions(
+    files: List[UploadFile],
+    options: PredictionRequest,
+    user_id: str
+):
+    """Run uploads through the model chunk by chunk and yield one NDJSON line per image"""
+    model_manager = get_model_manager()
+    loaded = model_manager.active
+    log_writer = get_prediction_log_writer()
+    image_writer = get_image_store_writer()
+    input_dtype = loaded.backend.input_dtype
+    # One input buffer reused for every chunk of this request
+    buffer = np.empty((INFERENCE_MAX_BATCH_SIZE,) + INPUT_SHAPE, dtype=input_dtype)
+    for start in range(0, len(files), INFERENCE_MAX_BATCH_SIZE):
+        chunk = files[start:start + INFERENCE_MAX_BATCH_SIZE]
+        contents = [await f.read() for f in chunk]
+        outputs = {}
+        lines = {}
         
-        # Get treatment suggestions
-        treatments = None
-        if include_treatment:
-            treatments = get_treatment_suggestions(predicted_class)
+        # Look the whole chunk up in the cache with a single MGET
+        image_hashes = await run_blocking(_hash_all, contents)
+        cache_keys = [_cache_key(image_hash, loaded.version, options) for image_hash in image_hashes]
+        for i, cached in enumerate(await cache_get_many(cache_keys)):
+            if cached is not None:
+                outputs[i] = cached
+        misses = [i for i in range(len(chunk)) if i not in outputs]
         
-        # Generate explainability
-        explainability = None
-        if include_explainability:
-            processed_img = model_manager.preprocess_image(image)
-            predicted_idx = CLASS_NAMES.index(predicted_class)
-            heatmap = generate_explainability_map(
-                processed_img, 
-                model_manager.model, 
-                predicted_idx
-            )
-            explainability = {
-                "heatmap": heatmap,
-                "method": "grad_cam",
-                "explanation": f"Areas highlighted show regions influencing the {predicted_class} prediction"
-            }
-        
-        # Prepare response
-        response = PredictionResponse(
-            prediction_id=prediction_id,
-            predicted_class=predicted_class,
-            confidence=confidence,
-            severity=severity,
-            all_probabilities=all_probs,
-            treatment_suggestions=treatments,
-            explainability=explainability,
-            metadata={
-                **meta_dict,
-                "model_version": model_manager.model_version,
-                "timestamp": datetime.utcnow().isoformat()
-            }
+        # Decode the misses in parallel; a bad image only fails its own line
+        decoded = await asyncio.gather(
+            *(run_decode(load_image_tensor, contents[i], input_dtype) for i in misses),
+            return_exceptions=True
         )
+        valid = []
+        for i, d in zip(misses, decoded):
+            if isinstance(d, Exception):
+                lines[i] = orjson.dumps({"filename": chunk[i].filename, "error": str(d)})
+            else:
+                valid.append((i, d))
+                await image_writer.submit(image_key(image_hashes[i]), contents[i])
         
-        # Log prediction to database
-        log_entry = PredictionLog(
-            id=prediction_id,
-            user_id=user_id,
-            predicted_class=predicted_class,
-            confidence=confidence,
-            metadata=meta_dict,
-            image_path=f"storage/{prediction_id}.jpg",
-            severity=severity,
-            treatment_plan=treatments
-        )
-        db.add(log_entry)
-        db.commit()
+        new_entries = {}
+        if valid:
+            # One real batch through the model for the whole chunk
+            batch = np.stack([d for _, d in valid], out=buffer[:len(valid)])
+            probabilities = await run_inference(model_manager.predict_batch, batch, loaded)
+            decoded_predictions = [
+                model_manager.decode_prediction(row, options.probability_format, options.top_k)
+                for row in probabilities
+            ]
+            
+            # Grad-CAM for the whole chunk in one compiled call
+            explanations = [None] * len(valid)
+            if options.include_explainability:
+                explanations = await _explain(
+                    loaded,
+                    batch,
+                    [p[0] for p in decoded_predictions],
+                    options.explainability_mode,
+                    [image_key(image_hashes[i]) for i, _ in valid]
+                )
+            
+            for (predicted_class, confidence, probs), explainability, (i, _) in zip(decoded_predictions, explanations, valid):
+                treatments = get_treatment_suggestions(predicted_class) if options.include_treatment else None
+                outputs[i] = _model_output(predicted_class, confidence, probs, treatments, explainability, options)
+                new_entries[cache_keys[i]] = outputs[i]
         
-        # Cache result
-        redis_client.setex(
-            cache_key,
-            3600,  # 1 hour
-            json.dumps(response.dict())
-        )
+        # Cached and new outputs alike get their own prediction id and log row
+        log_rows = []
+        for i, output in outputs.items():
+            body, log_row = _finish_prediction(
+                output,
+                options,
+                user_id,
+                loaded.version,
+                image_key(image_hashes[i]),
+                {"filename": chunk[i].filename}
+            )
+            lines[i] = body
+            log_rows.append(log_row)
         
-        return response
+        # Hand the chunk to the log writer, which inserts it in bulk
+        await log_writer.submit_many(log_rows)
+        # Cache the new results with one pipelined round trip
+        await cache_set_many(new_entries, PREDICTION_CACHE_TTL)
         
-    except Exception as e:
-        logger.error(f"Prediction error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        for i in range(len(chunk)):
+            yield lines[i] + b"\n"
+
+@router.post("/batch")
+async def predict_disease_batch(
+    files: List[UploadFile] = File(...),
+    metadata: str = '{}',
+    include_explainability: bool = False,
+    explainability_mode: Literal["sync", "async"] = "sync",
+    include_treatment: bool = True,
+    probability_format: Literal["dict", "array", "top_k"] = "dict",
+    top_k: int = Query(5, ge=1),
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Batch prediction endpoint
+    
+    Accepts many images in one multipart request and streams back one
+    PredictionResponse per line (NDJSON) as each model batch completes.
+    """
+    if len(files) > BATCH_PREDICT_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BATCH_PREDICT_MAX_FILES} images per batch request"
+        )
+    
+    try:
+        options = PredictionRequest(
+            metadata=json.loads(metadata),
+            include_explainability=include_explainability,
+            explainability_mode=explainability_mode,
+            include_treatment=include_treatment,
+            probability_format=probability_format,
+            top_k=top_k
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid metadata: {e}")
+    
+    return StreamingResponse(
+        _stream_batch_predictions(files, options, user_id),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/explainability/{job_id}")
+async def get_explainability_result(
+    job_id: str,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Poll an asynchronous explainability job
+    
+    Returns status pending, completed (with the explainability payload) or failed.
+    """
+    job = await run_blocking(get_explainability_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Explainability job not found or expired")
+    return job
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""
+Model Registry API Endpoints
+"""
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+import logging
+
+from backend.core.security import get_current_user
+from backend.core.executors import run_blocking
+from backend.services.model_registry import get_model_registry
+
+router = APIRouter(prefix="/models", tags=["models"])
+logger = logging.getLogger(__name__)
+
+async def _deploy_in_background(version: str):
+    """Load, warm up and swap a version on this worker"""
+    try:
+        await get_model_registry().deploy(version)
+    except Exception as e:
+        logger.error(f"Deployment of model version {version} failed: {e}")
+
+@router.get("/")
+async def list_models(user_id: str = Depends(get_current_user)):
+    """List active, resident and available model versions"""
+    return await run_blocking(get_model_registry().status)
+
+@router.post("/{version}/deploy", status_code=202)
+async def deploy_model(
+    version: str,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Roll a model version out to every API worker without downtime
+    
+    This worker starts swapping immediately; the others pick the version up
+    from the registry on their next poll.
+    """
+    registry = get_model_registry()
+    available = await run_blocking(registry.list_artifacts)
+    if version not in available:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    
+    await run_blocking(registry.set_desired_version, version)
+    background_tasks.add_task(_deploy_in_background, version)
+    return {"message": "Deployment started", "version": version}
+
+@router.post("/rollback", status_code=202)
+async def rollback_model(
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user)
+):
+    """Swap back to the previously active, still resident version"""
+    registry = get_model_registry()
+    version = registry.rollback_target()
+    if version is None:
+        raise HTTPException(status_code=409, detail="No resident version to roll back to")
+    
+    await run_blocking(registry.set_desired_version, version)
+    background_tasks.add_task(_deploy_in_background, version)
+    return {"message": "Rollback started", "version": version}
@@ -2,8 +2,21 @@
 Redis Cache Configuration
 """
 
+import asyncio
+import hashlib
+import msgpack
 import redis 
-from backend.config import REDIS_HOST, REDIS_PORT, REDIS_DB
+import redis.asyncio as aioredis
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from backend.config import (
+    REDIS_HOST, REDIS_PORT, REDIS_DB,
+    REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT, REDIS_SOCKET_TIMEOUT,
+    LOCAL_CACHE_MAX_BYTES, LOCAL_CACHE_TTL
+)
  
 #Initialize Redis client
 redis_client = redis.Redis(
@@ -13,6 +26,227 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
+# Async client for the API event loop. The blocking pool caps connections
+# per worker and makes callers wait briefly for a free one instead of failing.
+async_redis_pool = aioredis.BlockingConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+    health_check_interval=30
+)
+async_redis_client = aioredis.Redis(connection_pool=async_redis_pool)
+
 def get_redis_client():
     """Get Redis Client Instance"""
-    return redis_client
\ No newline at end of file
+    return redis_client
+
+def get_async_redis_client():
+    """Get async Redis Client Instance (raw bytes)"""
+    return async_redis_client
+
+async def close_async_redis():
+    """Close the async pool's connections on shutdown"""
+    await async_redis_pool.disconnect()
+
+def _pack_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__} for the cache")
+
+def pack(value: Any) -> bytes:
+    """Serialize a cache payload with msgpack (much smaller than JSON text for float-heavy data)"""
+    return msgpack.packb(value, use_bin_type=True, default=_pack_default)
+
+def unpack(data: bytes) -> Any:
+    """Deserialize a msgpack cache payload"""
+    return msgpack.unpackb(data, raw=False)
+
+class LocalCache:
+    """
+    Bounded in-process LRU with per-entry TTL
+
+    Holds packed payloads and is sized by their bytes, evicting the least
+    recently used entries once max_bytes is exceeded. Thread-safe, since
+    model swaps clear it from the inference pool.
+    """
+
+    def __init__(self, max_bytes: int = LOCAL_CACHE_MAX_BYTES, ttl: int = LOCAL_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires_at, payload, size)
+        self._entries: "OrderedDict[str, Tuple[float, bytes, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + min(ttl or self.ttl, self.ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+# First cache tier, per worker process
+local_cache = LocalCache()
+_redis_stats = {"hits": 0, "misses": 0}
+
+def get_local_cache() -> LocalCache:
+    """Get in-process cache instance"""
+    return local_cache
+
+def cache_stats() -> dict:
+    """Hit, miss and eviction counters of both cache tiers in this worker"""
+    return {"local": local_cache.stats(), "redis": dict(_redis_stats)}
+
+async def cache_get(key: str) -> Optional[Any]:
+    """Read one cached payload from the local tier, then Redis; None on a miss"""
+    data = local_cache.get(key)
+    if data is None:
+        data = await async_redis_client.get(key)
+        if data is None:
+            _redis_stats["misses"] += 1
+            return None
+        _redis_stats["hits"] += 1
+        local_cache.set(key, data)
+    return unpack(data)
+
+async def cache_set(key: str, value: Any, ttl: int):
+    """Write one payload with a TTL to both tiers"""
+    data = pack(value)
+    local_cache.set(key, data, ttl)
+    await async_redis_client.set(key, data, ex=ttl)
+
+async def cache_get_many(keys: List[str]) -> List[Optional[Any]]:
+    """Read many payloads, fetching local misses in one MGET round trip"""
+    values = [local_cache.get(key) for key in keys]
+    missing = [i for i, v in enumerate(values) if v is None]
+    if missing:
+        fetched = await async_redis_client.mget([keys[i] for i in missing])
+        for i, data in zip(missing, fetched):
+            if data is None:
+                _redis_stats["misses"] += 1
+                continue
+            _redis_stats["hits"] += 1
+            local_cache.set(keys[i], data)
+            values[i] = data
+    return [unpack(v) if v is not None else None for v in values]
+
+async def cache_set_many(items: Dict[str, Any], ttl: int):
+    """Write many payloads with a TTL to both tiers, one pipelined round trip to Redis"""
+    if not items:
+        return
+    pipe = async_redis_client.pipeline(transaction=False)
+    for key, value in items.items():
+        data = pack(value)
+        local_cache.set(key, data, ttl)
+        pipe.set(key, data, ex=ttl)
+    await pipe.execute()
+
+# Changed whenever cached predictions change shape, so entries written by
+# other API versions during a rollout are never read back
+PREDICTION_CACHE_SCHEMA = "o1"
+
+def content_hash(contents: bytes) -> str:
+    """SHA-256 hex digest identifying an uploaded image by its bytes"""
+    return hashlib.sha256(contents).hexdigest()
+
+def prediction_cache_key(
+    image_hash: str,
+    model_version: str,
+    include_treatment: bool,
+    include_explainability: bool,
+    async_explainability: bool = False,
+    probability_format: str = "dict",
+    top_k: int = 5
+) -> str:
+    """
+    Build the cache key for a prediction
+
+    The key is derived from the image content, the model version and the
+    response flags, so identical uploads share an entry regardless of file
+    name and a model swap invalidates old entries without a flush.
+    """
+    flags = f"t{int(include_treatment)}e{int(include_explainability)}"
+    if include_explainability and async_explainability:
+        flags += "a"
+    if probability_format == "array":
+        flags += "pa"
+    elif probability_format == "top_k":
+        flags += f"pk{top_k}"
+    return f"prediction:{PREDICTION_CACHE_SCHEMA}:{model_version}:{image_hash}:{flags}"
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one execution
+
+    The first caller starts the work as a task; callers arriving while it is
+    still running await the same task instead of repeating it. The task is
+    shielded so a disconnecting client does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
@@ -0,0 +1,85 @@
+"""
+Executor Pools for Blocking Work
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from backend.config import DECODE_POOL_TYPE, DECODE_POOL_SIZE, INFERENCE_POOL_SIZE, IO_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Pools are created lazily so importing this module stays cheap
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _create_pool(name: str) -> Executor:
+    """Create the executor backing a named pool"""
+    if name == "decode":
+        if DECODE_POOL_TYPE == "process":
+            return ProcessPoolExecutor(max_workers=DECODE_POOL_SIZE)
+        return ThreadPoolExecutor(max_workers=DECODE_POOL_SIZE, thread_name_prefix="decode")
+    if name == "inference":
+        return ThreadPoolExecutor(max_workers=INFERENCE_POOL_SIZE, thread_name_prefix="inference")
+    if name == "io":
+        return ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="io")
+    if name == "model_load":
+        # One load at a time, kept apart from the inference pool serving live batches
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-load")
+    raise ValueError(f"Unknown executor pool: {name}")
+
+def _get_pool(name: str) -> Executor:
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = _create_pool(name)
+    return pool
+
+def get_decode_pool() -> Executor:
+    """Pool for CPU-bound image decoding and preprocessing"""
+    return _get_pool("decode")
+
+def get_inference_pool() -> Executor:
+    """Bounded pool for model forward and backward passes"""
+    return _get_pool("inference")
+
+def get_io_pool() -> Executor:
+    """Pool for blocking database and cache calls"""
+    return _get_pool("io")
+
+def get_model_load_pool() -> Executor:
+    """Single thread for loading, warming up and unloading model versions"""
+    return _get_pool("model_load")
+
+async def run_in_pool(pool: Executor, fn, *args, **kwargs):
+    """Run a blocking callable in the given pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+async def run_decode(fn, *args, **kwargs):
+    """Run image decoding/preprocessing off the event loop"""
+    return await run_in_pool(get_decode_pool(), fn, *args, **kwargs)
+
+async def run_inference(fn, *args, **kwargs):
+    """Run model computation off the event loop"""
+    return await run_in_pool(get_inference_pool(), fn, *args, **kwargs)
+
+async def run_model_load(fn, *args, **kwargs):
+    """Run a model load or unload without occupying the inference pool"""
+    return await run_in_pool(get_model_load_pool(), fn, *args, **kwargs)
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run blocking I/O such as synchronous database or Redis calls off the event loop"""
+    return await run_in_pool(get_io_pool(), fn, *args, **kwargs)
+
+def shutdown_executors(wait: bool = True):
+    """Shut down every pool that has been created"""
+    with _pools_lock:
+        pools = list(_pools.items())
+        _pools.clear()
+    for name, pool in pools:
+        logger.info(f"Shutting down {name} executor")
+        pool.shutdown(wait=wait)
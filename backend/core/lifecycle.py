@@ -0,0 +1,68 @@
+"""
+Application Startup Stages and Readiness State
+"""
+import threading
+import time
+from enum import Enum
+from typing import Dict, Optional
+
+class StartupStage(str, Enum):
+    STARTING = "starting"
+    INITIALIZING_DATABASE = "initializing_database"
+    LOADING_MODEL = "loading_model"
+    WARMING_UP = "warming_up"
+    READY = "ready"
+    FAILED = "failed"
+    SHUTTING_DOWN = "shutting_down"
+
+class StartupState:
+    """
+    Tracks which startup stage this worker is in
+
+    Liveness only fails once startup has FAILED; readiness is reported only
+    after the model is loaded and warmed up, so the pod receives traffic
+    as soon as it can serve it quickly and not before.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage = StartupStage.STARTING
+        self.error: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.stage_durations: Dict[str, float] = {}
+        self._stage_started_at = self.started_at
+
+    def set_stage(self, stage: StartupStage):
+        """Move to the next stage and record how long the previous one took"""
+        with self._lock:
+            now = time.monotonic()
+            self.stage_durations[self.stage.value] = round(now - self._stage_started_at, 3)
+            self.stage = stage
+            self._stage_started_at = now
+
+    def fail(self, error: Exception):
+        """Mark startup as failed"""
+        self.set_stage(StartupStage.FAILED)
+        self.error = str(error)
+
+    @property
+    def is_alive(self) -> bool:
+        return self.stage != StartupStage.FAILED
+
+    @property
+    def is_ready(self) -> bool:
+        return self.stage == StartupStage.READY
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.stage.value,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "stage_durations": dict(self.stage_durations),
+            "error": self.error
+        }
+
+startup_state = StartupState()
+
+def get_startup_state() -> StartupState:
+    """Get startup state for this worker"""
+    return startup_state
@@ -0,0 +1,11 @@
+"""
+Shared FastAPI Dependencies
+"""
+from fastapi import HTTPException
+from backend.core.lifecycle import get_startup_state
+
+def require_ready():
+    """Reject requests with 503 until the model is loaded and warmed up"""
+    state = get_startup_state()
+    if not state.is_ready:
+        raise HTTPException(status_code=503, detail=f"Service not ready ({state.stage.value})")
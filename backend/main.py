@@ -2,28 +2,110 @@
 FastAPI Backend for Plant Disease Prediction System
 Main application entry point
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from datetime import datetime
+from sqlalchemy import text
+import asyncio
 import logging
 
 from backend.config import API_TITLE, API_VERSION, API_DESCRIPTION, CORS_ORIGINS, LOG_LEVEL
-from backend.database import engine, SessionLocal, Base
-from backend.core.cache import get_redis_client
-from backend.api import predictions, feedback, analytics
+from backend.database import async_engine, Base
+from backend.core.cache import get_async_redis_client, close_async_redis, get_local_cache
+from backend.api import predictions, feedback, analytics, registry
+from backend.core.executors import run_blocking, run_model_load, shutdown_executors
+from backend.core.lifecycle import StartupStage, get_startup_state
 from backend.services.model_service import get_model_manager
+from backend.services.model_registry import get_model_registry
+from backend.services.prediction_log_writer import get_prediction_log_writer
+from backend.services.image_store import get_image_store_writer
+from backend.services.log_archive import ensure_partitions
 
 # Logging Configuration
 logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+async def run_startup():
+    """
+    Staged startup, run in the background once the server is accepting connections
+    
+    Liveness is served from the first moment; readiness only once the model is
+    loaded and warmed up.
+    """
+    state = get_startup_state()
+    model_manager = get_model_manager()
+    try:
+        # Create database tables
+        state.set_stage(StartupStage.INITIALIZING_DATABASE)
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        # The maintenance task keeps partitions up too; serve even if this fails
+        try:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(ensure_partitions)
+        except Exception as e:
+            logger.warning(f"Could not create prediction log partitions: {e}")
+        
+        # Load model weights (imports the inference runtime on first use)
+        state.set_stage(StartupStage.LOADING_MODEL)
+        await run_model_load(model_manager.load_model)
+        
+        # Trigger graph tracing with dummy batches
+        state.set_stage(StartupStage.WARMING_UP)
+        await run_model_load(model_manager.warm_up)
+        
+        # Converge on the version deployed through the registry, if any
+        model_registry = get_model_registry()
+        model_registry.register_active()
+        desired = await _get_desired_version()
+        if desired and desired != model_manager.model_version:
+            state.set_stage(StartupStage.LOADING_MODEL)
+            await model_registry.deploy(desired)
+        
+        state.set_stage(StartupStage.READY)
+        logger.info(f"Startup complete: {state.to_dict()}")
+    except Exception as e:
+        logger.error(f"Startup failed in stage {state.stage.value}: {e}")
+        state.fail(e)
+
+async def _get_desired_version():
+    """Desired model version from the registry, or None if Redis is unavailable"""
+    try:
+        return await run_blocking(get_model_registry().get_desired_version)
+    except Exception as e:
+        logger.warning(f"Could not read desired model version: {e}")
+        return None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_prediction_log_writer().start()
+    # Every worker converges on the desired version through the registry and
+    # drops its in-process cache tier when it swaps; Redis keys carry the version
+    get_model_manager().add_swap_listener(lambda loaded: get_local_cache().clear())
+    startup_task = asyncio.create_task(run_startup())
+    registry_watch_task = asyncio.create_task(get_model_registry().watch())
+    yield
+    get_startup_state().set_stage(StartupStage.SHUTTING_DOWN)
+    startup_task.cancel()
+    registry_watch_task.cancel()
+    # Flush prediction logs and image writes still queued before the pools go away
+    await get_prediction_log_writer().close()
+    await get_image_store_writer().drain()
+    # Drain queued inference work and release executor pools
+    get_model_manager().shutdown()
+    get_model_registry().close()
+    shutdown_executors()
+    await async_engine.dispose()
+    await close_async_redis()
 
 # Initialize FastAPI
 app = FastAPI(
     title=API_TITLE,
     version=API_VERSION,
-    description=API_DESCRIPTION
+    description=API_DESCRIPTION,
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -39,6 +121,7 @@ app.add_middleware(
 app.include_router(predictions.router)
 app.include_router(feedback.router)
 app.include_router(analytics.router)
+app.include_router(registry.router)
 
 # Root endpoint
 @app.get("/")
@@ -49,6 +132,28 @@ async def root():
         "status": "operational"
     }
 
+# Liveness probe: the process is up and startup has not failed
+@app.get("/health/live")
+async def liveness():
+    state = get_startup_state()
+    return JSONResponse(
+        status_code=200 if state.is_alive else 503,
+        content={"alive": state.is_alive, **state.to_dict()}
+    )
+
+# Readiness probe: the model is loaded and warmed up
+@app.get("/health/ready")
+async def readiness():
+    state = get_startup_state()
+    return JSONResponse(
+        status_code=200 if state.is_ready else 503,
+        content={"ready": state.is_ready, **state.to_dict()}
+    )
+
+async def _check_database():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -56,21 +161,19 @@ async def health_check():
     try:
         # Check model
         model_manager = get_model_manager()
-        model_status = model_manager.model is not None
+        model_status = model_manager.is_loaded
         
         # Check database
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
+        await _check_database()
         db_status = True
         
         # Check Redis
-        redis_client = get_redis_client()
-        redis_client.ping()
+        await get_async_redis_client().ping()
         cache_status = True
         
         return {
             "status": "healthy",
+            "stage": get_startup_state().stage.value,
             "model": model_status,
             "database": db_status,
             "cache": cache_status,
@@ -82,6 +185,4 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    from datetime import datetime
-    from fastapi import HTTPException
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
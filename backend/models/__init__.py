@@ -4,5 +4,6 @@ Database Models Package
 from backend.models.prediction import PredictionLog
 from backend.models.feedback import UserFeedback
 from backend.models.metrics import ModelMetrics
+from backend.models.aggregates import PredictionAggregate
 
-__all__ = ["PredictionLog", "UserFeedback", "ModelMetrics"]
\ No newline at end of file
+__all__ = ["PredictionLog", "UserFeedback", "ModelMetrics", "PredictionAggregate"]
\ No newline at end of file
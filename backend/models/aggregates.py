@@ -0,0 +1,28 @@
+"""
+Prediction Aggregate Database Model
+"""
+from sqlalchemy import Column, String, Float, DateTime, Integer, Index
+from backend.database import Base
+
+class PredictionAggregate(Base):
+    """Prediction and feedback totals per time bucket and dimension combination"""
+    __tablename__ = "prediction_aggregates"
+    __table_args__ = (
+        Index(
+            "ix_prediction_aggregates_bucket",
+            "granularity", "bucket_start", "model_version", "region", "predicted_class", "severity",
+            unique=True
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    granularity = Column(String, nullable=False)  # hour or day
+    bucket_start = Column(DateTime, nullable=False)
+    model_version = Column(String, nullable=False)
+    region = Column(String, nullable=False)
+    predicted_class = Column(String, nullable=False)
+    severity = Column(String, nullable=False)
+    prediction_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    feedback_count = Column(Integer, nullable=False, default=0)
+    correct_count = Column(Integer, nullable=False, default=0)
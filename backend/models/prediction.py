@@ -1,20 +1,37 @@
 """
 Prediction Database Models
 """
-from sqlalchemy import Column, String, Float, DateTime, JSON, Integer
+from sqlalchemy import Column, String, Float, DateTime, JSON, Integer, Index, text
 from datetime import datetime
 from backend.database import Base
 
 class PredictionLog(Base):
     __tablename__ = "prediction_logs"
+    __table_args__ = (
+        Index("ix_prediction_logs_timestamp", "timestamp"),
+        Index("ix_prediction_logs_user_timestamp", "user_id", "timestamp"),
+        Index("ix_prediction_logs_version_timestamp", "model_version", "timestamp"),
+        Index("ix_prediction_logs_class_timestamp", "predicted_class", "timestamp"),
+        # Only corrected rows are looked up by their correction (retraining, feedback analytics)
+        Index(
+            "ix_prediction_logs_corrected",
+            "model_version", "corrected_class",
+            postgresql_where=text("corrected_class IS NOT NULL")
+        ),
+        # Daily partitions are managed by backend.services.log_archive
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
     
+    # Postgres requires the partition key in the primary key
     id = Column(String, primary_key=True)
-    user_id = Column(String, index=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(String)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    model_version = Column(String)
     predicted_class = Column(String)
     confidence = Column(Float)
     corrected_class = Column(String, nullable=True)
-    metadata = Column(JSON)
+    # "metadata" is reserved on declarative classes, so the column is mapped under another attribute
+    prediction_metadata = Column("metadata", JSON)
     image_path = Column(String)
     severity = Column(String)
     treatment_plan = Column(JSON)
\ No newline at end of file
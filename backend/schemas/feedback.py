@@ -1,8 +1,9 @@
 """
 Feedback Schemas
 """
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from backend.config import FEEDBACK_BULK_MAX_ITEMS
 
 class FeedbackRequest(BaseModel):
     prediction_id: str
@@ -11,4 +12,13 @@ class FeedbackRequest(BaseModel):
 
 class FeedbackResponse(BaseModel):
     message: str
-    feedback_id: str
\ No newline at end of file
+    feedback_id: str
+
+class BulkFeedbackRequest(BaseModel):
+    items: List[FeedbackRequest] = Field(..., min_length=1, max_length=FEEDBACK_BULK_MAX_ITEMS)
+
+class BulkFeedbackResponse(BaseModel):
+    message: str
+    feedback_ids: List[str]
+    updated_predictions: int
+    unknown_prediction_ids: List[str]
\ No newline at end of file
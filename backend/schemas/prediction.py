@@ -2,19 +2,29 @@
 Prediction Request/Response Schemas
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 
 class PredictionRequest(BaseModel):
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict)
     include_explainability: bool = False
+    explainability_mode: Literal["sync", "async"] = "sync"
     include_treatment: bool = True
+    probability_format: Literal["dict", "array", "top_k"] = "dict"
+    top_k: int = Field(5, ge=1)
+
+class ClassProbability(BaseModel):
+    class_name: str
+    probability: float
 
 class PredictionResponse(BaseModel):
     prediction_id: str
     predicted_class: str
     confidence: float
     severity: str
-    all_probabilities: Dict[str, float]
+    # Exactly one of these is set, depending on the requested probability_format
+    all_probabilities: Optional[Dict[str, float]] = None
+    probabilities: Optional[List[float]] = None  # in CLASS_NAMES order
+    top_predictions: Optional[List[ClassProbability]] = None
     treatment_suggestions: Optional[List[Dict[str, Any]]] = None
     explainability: Optional[Dict[str, Any]] = None
     metadata: Dict[str, Any]
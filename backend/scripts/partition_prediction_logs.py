@@ -0,0 +1,31 @@
+"""
+Partition prediction_logs
+One-off conversion of an existing unpartitioned prediction_logs table into daily partitions
+
+Run once against the production database before deploying the partitioned
+schema, with the API and workers stopped so no logs are written meanwhile:
+
+    DATABASE_URL=postgresql://... python backend/scripts/partition_prediction_logs.py
+
+The conversion runs in a single transaction: the old table is renamed aside,
+the partitioned table and a partition for every day present are created, the
+rows are copied over and the old table is dropped. Any failure rolls all of
+it back. Partitions past PREDICTION_LOG_RETENTION_DAYS are archived to
+Parquet by the next maintenance run (prediction_logs.maintain_partitions).
+"""
+
+import logging
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.database import engine
+from backend.services.log_archive import convert_to_partitioned
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    rows = convert_to_partitioned(engine)
+    print(f"prediction_logs partitioned, {rows} rows copied")
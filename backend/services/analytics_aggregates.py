@@ -0,0 +1,244 @@
+"""
+Analytics Aggregates - Hourly and daily prediction buckets for time series
+
+aggregate_predictions() runs periodically from a Celery beat task. It
+re-buckets the prediction logs written since its previous run, plus the
+older predictions that received feedback since then, replaces those hour
+rows of prediction_aggregates and re-derives the day rows from them.
+Time series endpoints read the aggregates, whose size grows with buckets x
+dimension combinations instead of with the number of predictions.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.config import ANALYTICS_AGGREGATE_LATENESS_SECONDS, ANALYTICS_REGION_KEY
+from backend.core.cache import get_redis_client
+from backend.models.aggregates import PredictionAggregate
+from backend.models.feedback import UserFeedback
+from backend.models.prediction import PredictionLog
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_WATERMARK_KEY = "analytics:aggregates:watermark"
+# Value stored for a dimension the prediction did not record
+UNKNOWN = "unknown"
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+DIMENSIONS = ("model_version", "region", "predicted_class", "severity")
+
+Dimensions = Tuple[str, str, str, str]
+
+def floor_bucket(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing timestamp"""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def to_naive_utc(timestamp: datetime) -> datetime:
+    """Timestamps are stored as naive UTC"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _dimensions(model_version, metadata, predicted_class, severity) -> Dimensions:
+    region = metadata.get(ANALYTICS_REGION_KEY) if isinstance(metadata, dict) else None
+    return (
+        model_version or UNKNOWN,
+        str(region) if region else UNKNOWN,
+        predicted_class or UNKNOWN,
+        severity or UNKNOWN
+    )
+
+_LOG_COLUMNS = (
+    PredictionLog.timestamp,
+    PredictionLog.model_version,
+    PredictionLog.prediction_metadata,
+    PredictionLog.predicted_class,
+    PredictionLog.severity
+)
+
+def _bucket_hours(db: Session, start: datetime, end: datetime) -> Dict[Tuple[datetime, Dimensions], list]:
+    """[predictions, confidence sum, feedbacks, correct] per hour and dimensions, for logs in [start, end)"""
+    totals = defaultdict(lambda: [0, 0.0, 0, 0])
+    in_range = (PredictionLog.timestamp >= start, PredictionLog.timestamp < end)
+
+    predictions = db.execute(
+        select(*_LOG_COLUMNS, PredictionLog.confidence)
+        .where(*in_range)
+        .execution_options(yield_per=5000)
+    )
+    for timestamp, version, metadata, class_name, severity, confidence in predictions:
+        bucket = totals[(floor_bucket(timestamp, "hour"), _dimensions(version, metadata, class_name, severity))]
+        bucket[0] += 1
+        bucket[1] += confidence or 0.0
+
+    # Feedback counts towards the bucket of the prediction it corrects
+    feedback = db.execute(
+        select(*_LOG_COLUMNS, UserFeedback.correct_class)
+        .join(PredictionLog, PredictionLog.id == UserFeedback.prediction_id)
+        .where(*in_range)
+        .execution_options(yield_per=5000)
+    )
+    for timestamp, version, metadata, class_name, severity, correct_class in feedback:
+        bucket = totals[(floor_bucket(timestamp, "hour"), _dimensions(version, metadata, class_name, severity))]
+        bucket[2] += 1
+        bucket[3] += int(correct_class == class_name)
+    return totals
+
+def _write_hours(db: Session, start: datetime, end: datetime, totals: Dict[Tuple[datetime, Dimensions], list]):
+    """Replace the hour rows in [start, end) with totals"""
+    db.execute(
+        delete(PredictionAggregate).where(
+            PredictionAggregate.granularity == "hour",
+            PredictionAggregate.bucket_start >= start,
+            PredictionAggregate.bucket_start < end
+        )
+    )
+    if totals:
+        db.execute(insert(PredictionAggregate), [
+            {
+                "granularity": "hour",
+                "bucket_start": bucket_start,
+                **dict(zip(DIMENSIONS, dimensions)),
+                "prediction_count": count,
+                "confidence_sum": confidence_sum,
+                "feedback_count": feedbacks,
+                "correct_count": correct
+            }
+            for (bucket_start, dimensions), (count, confidence_sum, feedbacks, correct) in totals.items()
+        ])
+
+def _write_days(db: Session, days: Iterable[datetime]):
+    """Re-derive the day rows of the given days from their hour rows"""
+    dimensions = [getattr(PredictionAggregate, name) for name in DIMENSIONS]
+    for day in days:
+        db.execute(
+            delete(PredictionAggregate).where(
+                PredictionAggregate.granularity == "day",
+                PredictionAggregate.bucket_start == day
+            )
+        )
+        db.execute(
+            insert(PredictionAggregate).from_select(
+                ["granularity", "bucket_start", *DIMENSIONS,
+                 "prediction_count", "confidence_sum", "feedback_count", "correct_count"],
+                select(
+                    literal("day"),
+                    literal(day, DateTime),
+                    *dimensions,
+                    func.sum(PredictionAggregate.prediction_count),
+                    func.sum(PredictionAggregate.confidence_sum),
+                    func.sum(PredictionAggregate.feedback_count),
+                    func.sum(PredictionAggregate.correct_count)
+                )
+                .where(
+                    PredictionAggregate.granularity == "hour",
+                    PredictionAggregate.bucket_start >= day,
+                    PredictionAggregate.bucket_start < day + GRANULARITIES["day"]
+                )
+                .group_by(*dimensions)
+            )
+        )
+
+def get_watermark() -> Optional[datetime]:
+    """Time the last aggregation run started, None before the first run"""
+    value = get_redis_client().get(AGGREGATE_WATERMARK_KEY)
+    return datetime.fromisoformat(value) if value else None
+
+def aggregate_predictions(db: Session, now: Optional[datetime] = None) -> dict:
+    """Bring the aggregates up to date with the prediction and feedback logs"""
+    now = now or datetime.utcnow()
+    hour = GRANULARITIES["hour"]
+    lateness = timedelta(seconds=ANALYTICS_AGGREGATE_LATENESS_SECONDS)
+    watermark = get_watermark()
+
+    if watermark is None:
+        # First run: backfill from the oldest log
+        since = db.scalar(select(func.min(PredictionLog.timestamp)))
+    else:
+        since = watermark - lateness
+    ranges = []
+    if since is not None:
+        ranges.append((floor_bucket(since, "hour"), floor_bucket(now, "hour") + hour))
+
+    # Older predictions whose feedback arrived since the last run
+    if watermark is not None:
+        corrected = db.scalars(
+            select(PredictionLog.timestamp)
+            .join(UserFeedback, PredictionLog.id == UserFeedback.prediction_id)
+            .where(UserFeedback.timestamp >= since, PredictionLog.timestamp < ranges[0][0])
+            .distinct()
+        )
+        hours = sorted({floor_bucket(timestamp, "hour") for timestamp in corrected if timestamp})
+        ranges.extend((start, start + hour) for start in hours)
+
+    days = set()
+    for start, end in ranges:
+        _write_hours(db, start, end, _bucket_hours(db, start, end))
+        day = floor_bucket(start, "day")
+        while day < end:
+            days.add(day)
+            day += GRANULARITIES["day"]
+    _write_days(db, sorted(days))
+    db.commit()
+
+    get_redis_client().set(AGGREGATE_WATERMARK_KEY, now.isoformat())
+    summary = {"hour_ranges": len(ranges), "days": len(days), "watermark": now.isoformat()}
+    logger.info(f"Aggregated predictions: {summary}")
+    return summary
+
+async def query_timeseries(
+    db: AsyncSession,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    model_version: Optional[str] = None,
+    region: Optional[str] = None,
+    predicted_class: Optional[str] = None,
+    group_by: Optional[str] = None
+) -> List[dict]:
+    """Totals per bucket in [start, end), optionally split by one dimension"""
+    columns = [PredictionAggregate.bucket_start]
+    if group_by:
+        columns.append(getattr(PredictionAggregate, group_by))
+    filters = [
+        PredictionAggregate.granularity == granularity,
+        PredictionAggregate.bucket_start >= floor_bucket(start, granularity),
+        PredictionAggregate.bucket_start < end
+    ]
+    for name, value in (("model_version", model_version), ("region", region), ("predicted_class", predicted_class)):
+        if value is not None:
+            filters.append(getattr(PredictionAggregate, name) == value)
+
+    result = await db.execute(
+        select(
+            *columns,
+            func.sum(PredictionAggregate.prediction_count),
+            func.sum(PredictionAggregate.confidence_sum),
+            func.sum(PredictionAggregate.feedback_count),
+            func.sum(PredictionAggregate.correct_count)
+        )
+        .where(*filters)
+        .group_by(*columns)
+        .order_by(*columns)
+    )
+
+    points = []
+    for row in result:
+        count, confidence_sum, feedbacks, correct = row[-4:]
+        point = {"bucket_start": row[0].isoformat()}
+        if group_by:
+            point[group_by] = row[1]
+        point.update({
+            "predictions": int(count or 0),
+            "mean_confidence": confidence_sum / count if count else None,
+            "feedbacks": int(feedbacks or 0),
+            "accuracy": correct / feedbacks if feedbacks else None
+        })
+        points.append(point)
+    return points
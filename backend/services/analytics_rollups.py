@@ -0,0 +1,170 @@
+"""
+Analytics Rollups - Incrementally maintained counters per model version and class
+
+Every flushed batch of prediction logs and every feedback submission adds
+to a Redis hash per model version, so /analytics/model-metrics reads a
+handful of fields instead of scanning the log tables. rebuild_rollups()
+recomputes the hashes from the database if they are lost or drift.
+"""
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.cache import get_async_redis_client
+from backend.models.feedback import UserFeedback
+from backend.models.prediction import PredictionLog
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEY = "analytics:rollup:{model_version}"
+ROLLUP_VERSIONS_KEY = "analytics:rollup:versions"
+# Rows logged before model_version was recorded
+UNKNOWN_VERSION = "unknown"
+
+def _rollup_key(model_version: Optional[str]) -> str:
+    return ROLLUP_KEY.format(model_version=model_version or UNKNOWN_VERSION)
+
+async def record_predictions(rows: Iterable[dict]):
+    """Add a batch of PredictionLog rows to the rollups in one pipeline"""
+    counts = Counter()
+    confidence_sums = defaultdict(float)
+    for row in rows:
+        version = row.get("model_version") or UNKNOWN_VERSION
+        counts[(version, "predictions")] += 1
+        counts[(version, f"predictions:{row['predicted_class']}")] += 1
+        confidence_sums[version] += row["confidence"]
+    if not counts:
+        return
+
+    pipe = get_async_redis_client().pipeline(transaction=False)
+    for (version, field), n in counts.items():
+        pipe.hincrby(_rollup_key(version), field, n)
+    for version, total in confidence_sums.items():
+        pipe.hincrbyfloat(_rollup_key(version), "confidence_sum", total)
+    pipe.sadd(ROLLUP_VERSIONS_KEY, *confidence_sums.keys())
+    await pipe.execute()
+
+async def record_feedback(model_version: Optional[str], predicted_class: str, correct_class: str) -> int:
+    """Add one feedback on a logged prediction to the rollups, returning the version's feedback count"""
+    counts = await record_feedbacks([(model_version, predicted_class, correct_class)])
+    return counts[model_version or UNKNOWN_VERSION]
+
+async def record_feedbacks(entries: Iterable[Tuple[Optional[str], str, str]]) -> Dict[str, int]:
+    """
+    Add (model_version, predicted_class, correct_class) feedbacks in one pipeline
+
+    Returns the new feedback count of every version touched.
+    """
+    counts = Counter()
+    for model_version, predicted_class, correct_class in entries:
+        version = model_version or UNKNOWN_VERSION
+        counts[(version, "feedback")] += 1
+        counts[(version, f"feedback:{predicted_class}")] += 1
+        if correct_class == predicted_class:
+            counts[(version, "correct")] += 1
+            counts[(version, f"correct:{predicted_class}")] += 1
+    if not counts:
+        return {}
+
+    versions = sorted({version for version, _ in counts})
+    pipe = get_async_redis_client().pipeline(transaction=False)
+    # Version totals first so their results can be read back by position
+    for version in versions:
+        pipe.hincrby(_rollup_key(version), "feedback", counts.pop((version, "feedback")))
+    for (version, field), n in counts.items():
+        pipe.hincrby(_rollup_key(version), field, n)
+    pipe.sadd(ROLLUP_VERSIONS_KEY, *versions)
+    results = await pipe.execute()
+    return {version: int(total) for version, total in zip(versions, results)}
+
+def _summarize(model_version: str, fields: Dict[str, float]) -> dict:
+    """Turn the raw hash fields of one version into metrics"""
+    predictions = int(fields.get("predictions", 0))
+    feedbacks = int(fields.get("feedback", 0))
+    correct = int(fields.get("correct", 0))
+
+    per_class = defaultdict(lambda: {"predictions": 0, "feedbacks": 0, "correct": 0})
+    for field, value in fields.items():
+        kind, _, class_name = field.partition(":")
+        if class_name and kind in ("predictions", "feedback", "correct"):
+            name = "feedbacks" if kind == "feedback" else kind
+            per_class[class_name][name] = int(value)
+    for stats in per_class.values():
+        stats["accuracy"] = stats["correct"] / stats["feedbacks"] if stats["feedbacks"] else None
+
+    return {
+        "model_version": model_version,
+        "total_predictions": predictions,
+        "mean_confidence": fields.get("confidence_sum", 0.0) / predictions if predictions else None,
+        "user_feedbacks": feedbacks,
+        "correct_feedbacks": correct,
+        "estimated_accuracy": correct / feedbacks if feedbacks > 0 else 1.0,
+        "per_class": dict(per_class)
+    }
+
+async def get_rollup(model_version: str) -> dict:
+    """Metrics of one model version"""
+    raw = await get_async_redis_client().hgetall(_rollup_key(model_version))
+    fields = {k.decode(): float(v) for k, v in raw.items()}
+    return _summarize(model_version, fields)
+
+async def get_rollup_versions() -> List[str]:
+    """Model versions that have rollups"""
+    versions = await get_async_redis_client().smembers(ROLLUP_VERSIONS_KEY)
+    return sorted(v.decode() for v in versions)
+
+async def rebuild_rollups(db: AsyncSession) -> List[str]:
+    """Recompute every rollup from the database and replace the Redis hashes"""
+    fields: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    predictions = await db.execute(
+        select(
+            PredictionLog.model_version,
+            PredictionLog.predicted_class,
+            func.count(),
+            func.sum(PredictionLog.confidence)
+        ).group_by(PredictionLog.model_version, PredictionLog.predicted_class)
+    )
+    for version, class_name, count, confidence_sum in predictions:
+        version = version or UNKNOWN_VERSION
+        fields[version]["predictions"] += count
+        fields[version][f"predictions:{class_name}"] += count
+        fields[version]["confidence_sum"] += confidence_sum or 0.0
+
+    # Each feedback is compared with the prediction it refers to
+    feedback = await db.execute(
+        select(
+            PredictionLog.model_version,
+            PredictionLog.predicted_class,
+            func.count(UserFeedback.id),
+            func.sum(case((UserFeedback.correct_class == PredictionLog.predicted_class, 1), else_=0))
+        )
+        .join(PredictionLog, PredictionLog.id == UserFeedback.prediction_id)
+        .group_by(PredictionLog.model_version, PredictionLog.predicted_class)
+    )
+    for version, class_name, count, correct in feedback:
+        version = version or UNKNOWN_VERSION
+        fields[version]["feedback"] += count
+        fields[version][f"feedback:{class_name}"] += count
+        fields[version]["correct"] += correct or 0
+        fields[version][f"correct:{class_name}"] += correct or 0
+
+    client = get_async_redis_client()
+    old_versions = await client.smembers(ROLLUP_VERSIONS_KEY)
+    pipe = client.pipeline(transaction=True)
+    for version in old_versions:
+        pipe.delete(_rollup_key(version.decode()))
+    pipe.delete(ROLLUP_VERSIONS_KEY)
+    for version, mapping in fields.items():
+        pipe.hset(_rollup_key(version), mapping={
+            field: value if field == "confidence_sum" else int(value)
+            for field, value in mapping.items()
+        })
+    if fields:
+        pipe.sadd(ROLLUP_VERSIONS_KEY, *fields.keys())
+    await pipe.execute()
+    logger.info(f"Rebuilt analytics rollups for {len(fields)} model versions")
+    return sorted(fields)
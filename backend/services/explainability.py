@@ -1,42 +1,98 @@
 """
 Explainability Service - Grad-CAM implementation
 """
-import tensorflow as tf
 import numpy as np
+import base64
+import io
 import logging
+from typing import Optional, Sequence
+from PIL import Image
 
 logger = logging.getLogger(__name__)
 
-def generate_explainability_map(image: np.ndarray, model, predicted_class_idx: int):
-    """Generate Grad-CAM heatmap for explainability"""
-    try:
-        # Get last conv layer
+HEATMAP_ENCODINGS = ("png", "float16", "list")
+
+class GradCamEngine:
+    """
+    Grad-CAM for one loaded Keras model
+
+    The gradient model is built once per model version and the forward and
+    backward pass run as a single compiled tf.function over whole batches,
+    instead of scanning layers and tracing eagerly on every request.
+    """
+
+    def __init__(self, model):
+        # Imported lazily so API processes using a non-Keras backend never load TensorFlow
+        import tensorflow as tf
+
         last_conv_layer = None
         for layer in reversed(model.layers):
             if isinstance(layer, tf.keras.layers.Conv2D):
                 last_conv_layer = layer
                 break
-        
         if last_conv_layer is None:
-            return None
-        
+            raise ValueError("Grad-CAM needs a model with at least one Conv2D layer")
+
         grad_model = tf.keras.models.Model(
             [model.inputs],
             [last_conv_layer.output, model.output]
         )
-        
-        with tf.GradientTape() as tape:
-            conv_outputs, predictions = grad_model(image)
-            loss = predictions[:, predicted_class_idx]
-        
-        grads = tape.gradient(loss, conv_outputs)
-        pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
-        
-        conv_outputs = conv_outputs[0]
-        heatmap = tf.reduce_sum(tf.multiply(pooled_grads, conv_outputs), axis=-1)
-        heatmap = tf.maximum(heatmap, 0) / tf.math.reduce_max(heatmap)
-        
-        return heatmap.numpy().tolist()
-    except Exception as e:
-        logger.error(f"Error generating explainability map: {e}")
-        return None
\ No newline at end of file
+        input_shape = tuple(model.input_shape[1:])
+
+        @tf.function(input_signature=[
+            tf.TensorSpec((None,) + input_shape, tf.float32),
+            tf.TensorSpec((None,), tf.int32)
+        ])
+        def compute(images, class_indices):
+            with tf.GradientTape() as tape:
+                conv_outputs, predictions = grad_model(images, training=False)
+                loss = tf.gather(predictions, class_indices, axis=1, batch_dims=1)
+            grads = tape.gradient(loss, conv_outputs)
+            # Channel weights per image, then weighted sum over channels
+            pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+            heatmaps = tf.einsum('bhwc,bc->bhw', conv_outputs, pooled_grads)
+            heatmaps = tf.maximum(heatmaps, 0)
+            return tf.math.divide_no_nan(heatmaps, tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True))
+
+        self.layer_name = last_conv_layer.name
+        self._compute = compute
+
+    def compute(self, images: np.ndarray, class_indices: Sequence[int]) -> np.ndarray:
+        """Heatmaps in [0, 1] shaped (N, h, w) for a batch of preprocessed images"""
+        heatmaps = self._compute(
+            np.asarray(images, dtype=np.float32),
+            np.asarray(class_indices, dtype=np.int32)
+        )
+        return heatmaps.numpy()
+
+def encode_heatmap(heatmap: np.ndarray, encoding: str = "png") -> Optional[dict]:
+    """
+    Encode a heatmap compactly for the JSON response
+
+    png: uint8-quantised grayscale PNG, base64 encoded
+    float16: raw little-endian float16 values, base64 encoded
+    list: nested list of floats (legacy format, largest)
+    """
+    if heatmap is None:
+        return None
+    height, width = heatmap.shape
+    if encoding == "png":
+        pixels = np.round(np.clip(heatmap, 0.0, 1.0) * 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, mode="L").save(buffer, format="PNG", optimize=True)
+        data = base64.b64encode(buffer.getvalue()).decode("ascii")
+    elif encoding == "float16":
+        data = base64.b64encode(heatmap.astype("<f2").tobytes()).decode("ascii")
+    elif encoding == "list":
+        data = heatmap.tolist()
+    else:
+        raise ValueError(f"Unknown heatmap encoding '{encoding}'. Choose from: {', '.join(HEATMAP_ENCODINGS)}")
+    return {"encoding": encoding, "shape": [height, width], "data": data}
+
+def explainability_payload(heatmap: np.ndarray, predicted_class: str, encoding: str = "png") -> dict:
+    """Explainability section of a prediction response"""
+    return {
+        "heatmap": encode_heatmap(heatmap, encoding),
+        "method": "grad_cam",
+        "explanation": f"Areas highlighted show regions influencing the {predicted_class} prediction"
+    }
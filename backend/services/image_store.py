@@ -0,0 +1,225 @@
+"""
+Image Store - Content-addressed persistence of uploaded images
+
+Images are stored once per SHA-256 of their bytes under a fan-out key
+(`ab/cd/abcd...`), which is what PredictionLog.image_path records.
+"""
+import asyncio
+import contextlib
+import functools
+import logging
+import mmap
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backend.config import (
+    IMAGE_STORE_BACKEND, IMAGE_STORE_PATH, IMAGE_STORE_MAX_PENDING,
+    S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL
+)
+from backend.core.executors import get_io_pool
+from backend.services import preprocessing
+
+logger = logging.getLogger(__name__)
+
+def image_key(image_hash: str) -> str:
+    """Store key for an image identified by the SHA-256 of its bytes"""
+    return f"{image_hash[:2]}/{image_hash[2:4]}/{image_hash}"
+
+class ImageStore:
+    """Common interface of the image store backends"""
+    name = "base"
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes) -> bool:
+        """Store data under key unless already present; True if it was written"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    @contextlib.contextmanager
+    def open(self, key: str):
+        """Readable buffer for key; memory-mapped where the backend allows it"""
+        yield self.get(key)
+
+class LocalImageStore(ImageStore):
+    """Directory tree on local or network-mounted disk"""
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def put(self, key: str, data: bytes) -> bool:
+        path = self.path(key)
+        if os.path.exists(path):
+            return False
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return True
+
+    def get(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    @contextlib.contextmanager
+    def open(self, key: str):
+        """Memory-map the image read-only; pages are loaded lazily and shared via the page cache"""
+        with open(self.path(key), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+class S3ImageStore(ImageStore):
+    """S3 or any S3-compatible service (MinIO, LocalStack) via endpoint_url"""
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self._client = None
+
+    @property
+    def client(self):
+        # boto3 is imported lazily so local-store deployments do not need it
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+        return self._client
+
+    def _object_key(self, key: str) -> str:
+        return self.prefix + key
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, key: str, data: bytes) -> bool:
+        if self.exists(key):
+            return False
+        self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=data)
+        return True
+
+    def get(self, key: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        return response["Body"].read()
+
+def create_image_store(name: str = IMAGE_STORE_BACKEND) -> ImageStore:
+    """Instantiate the configured image store backend"""
+    if name == "local":
+        return LocalImageStore(IMAGE_STORE_PATH)
+    if name == "s3":
+        return S3ImageStore(S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL)
+    raise ValueError(f"Unknown image store backend '{name}'. Choose from: local, s3")
+
+class ImageStoreWriter:
+    """
+    Persist uploads in the background, off the request path
+
+    submit() hands the write to the io pool and returns immediately.
+    Concurrent submissions of the same image are written once, and at most
+    max_pending writes are in flight: beyond that submit() waits, so a
+    slow store pushes back instead of buffering uploads without bound.
+    """
+
+    def __init__(self, store: ImageStore, max_pending: int = IMAGE_STORE_MAX_PENDING):
+        self.store = store
+        self.max_pending = max(1, max_pending)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def submit(self, key: str, data: bytes):
+        """Schedule data to be stored under key"""
+        if key in self._pending:
+            return
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        await self._slots.acquire()
+        if key in self._pending:
+            self._slots.release()
+            return
+        future = asyncio.get_running_loop().run_in_executor(get_io_pool(), self.store.put, key, data)
+        self._pending[key] = future
+        future.add_done_callback(functools.partial(self._done, key))
+
+    def _done(self, key: str, future: asyncio.Future):
+        self._pending.pop(key, None)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Storing image {key} failed: {future.exception()}")
+
+    async def drain(self):
+        """Wait for every write in flight (on shutdown)"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending.values()), return_exceptions=True)
+
+def iter_images(keys: Iterable[str], store: Optional[ImageStore] = None) -> Iterator[Tuple[str, object]]:
+    """Yield (key, buffer) for each stored image, memory-mapped on the local store"""
+    store = store or get_image_store()
+    for key in keys:
+        with store.open(key) as buffer:
+            yield key, buffer
+
+def load_images(
+    keys: List[str],
+    store: Optional[ImageStore] = None,
+    dtype=np.float32,
+    scale: bool = True
+) -> np.ndarray:
+    """
+    Decode and preprocess stored images into one (N, 128, 128, 3) batch
+
+    For bulk consumers such as retraining and backfills: each file is read
+    through mmap straight into the decoder, without an intermediate copy.
+    """
+    out = np.empty((len(keys),) + preprocessing.INPUT_SHAPE, dtype=dtype)
+    for i, (_, buffer) in enumerate(iter_images(keys, store)):
+        preprocessing.load_image_tensor(buffer, scale=scale, out=out[i])
+    return out
+
+# Singleton instances, created on first use
+_image_store: Optional[ImageStore] = None
+_image_store_writer: Optional[ImageStoreWriter] = None
+
+def get_image_store() -> ImageStore:
+    """Get image store instance"""
+    global _image_store
+    if _image_store is None:
+        _image_store = create_image_store()
+    return _image_store
+
+def get_image_store_writer() -> ImageStoreWriter:
+    """Get background image writer instance"""
+    global _image_store_writer
+    if _image_store_writer is None:
+        _image_store_writer = ImageStoreWriter(get_image_store())
+    return _image_store_writer
@@ -0,0 +1,323 @@
+"""
+Prediction Log Archive - Daily partitions of prediction_logs and their Parquet archive
+
+On Postgres prediction_logs is range-partitioned by timestamp, one
+partition per UTC day (prediction_logs_pYYYYMMDD) plus a default partition
+catching anything outside them. maintain_partitions() creates partitions
+ahead of time, moves rows the default caught into daily partitions, and
+moves partitions past the retention into Parquet files laid out as
+<archive>/date=YYYY-MM-DD/prediction_logs.parquet, then drops them.
+Monitoring and retraining read the archive with read_archived_logs().
+
+An existing unpartitioned prediction_logs is converted once with
+convert_to_partitioned() (backend/scripts/partition_prediction_logs.py).
+"""
+import glob
+import logging
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import JSON, Text, cast, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from backend.config import (
+    PREDICTION_LOG_ARCHIVE_PATH, PREDICTION_LOG_PARTITION_PREMAKE_DAYS, PREDICTION_LOG_RETENTION_DAYS
+)
+from backend.models.prediction import PredictionLog
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = PredictionLog.__tablename__
+PARTITION_PREFIX = f"{TABLE_NAME}_p"
+DEFAULT_PARTITION = f"{TABLE_NAME}_default"
+ARCHIVE_FILE = "prediction_logs.parquet"
+UNPARTITIONED_TABLE = f"{TABLE_NAME}_unpartitioned"
+ARCHIVE_BATCH_SIZE = 50000
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+def is_partitioned(conn: Connection) -> bool:
+    """Whether prediction_logs is a partitioned Postgres table"""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.scalar(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+    ), {"table": TABLE_NAME}))
+
+def list_partitions(conn: Connection) -> List[Tuple[str, date]]:
+    """(name, day) of every daily partition, oldest first"""
+    names = conn.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {"table": TABLE_NAME})
+    partitions = []
+    for name in names:
+        if name.startswith(PARTITION_PREFIX):
+            partitions.append((name, datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def _create_day_partition(conn: Connection, day: date):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {TABLE_NAME} "
+        f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+    ))
+
+def _quoted(conn: Connection, names: Sequence[str]) -> List[str]:
+    return [conn.dialect.identifier_preparer.quote(name) for name in names]
+
+def _default_partition_days(conn: Connection, start: Optional[date] = None, end: Optional[date] = None) -> List[date]:
+    """Days the default partition holds rows of, within [start, end) if given"""
+    if conn.scalar(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}) is None:
+        return []
+    query = f"SELECT DISTINCT CAST(timestamp AS date) FROM {DEFAULT_PARTITION}"
+    params = {}
+    if start is not None:
+        query += " WHERE timestamp >= :start AND timestamp < :end"
+        params = {"start": start, "end": end}
+    return sorted(conn.scalars(text(query), params))
+
+def ensure_partitions(conn: Connection, today: Optional[date] = None, days_ahead: int = PREDICTION_LOG_PARTITION_PREMAKE_DAYS):
+    """
+    Create the default partition and the daily ones from today to days_ahead
+
+    Postgres refuses to create a partition for a day the default partition
+    already holds rows of; such days are skipped here and split out of the
+    default by split_default_partition() in maintain_partitions().
+    """
+    if not is_partitioned(conn):
+        if conn.dialect.name == "postgresql":
+            logger.warning(
+                f"{TABLE_NAME} is not partitioned; convert it with backend/scripts/partition_prediction_logs.py"
+            )
+        return
+    today = today or datetime.utcnow().date()
+    end = today + timedelta(days=days_ahead + 1)
+    held = set(_default_partition_days(conn, today, end))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE_NAME} DEFAULT"))
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if day in held:
+            logger.warning(f"{DEFAULT_PARTITION} holds rows of {day}; its partition is left to maintain_partitions")
+            continue
+        _create_day_partition(conn, day)
+
+def split_default_partition(conn: Connection) -> List[date]:
+    """
+    Move the rows of the default partition into daily partitions
+
+    The default is detached, a partition is created for every day it holds
+    rows of, its rows are moved through the parent and it is attached again,
+    all in the caller's transaction. Returns the days moved; expired ones
+    are then archived like any other partition.
+    """
+    days = _default_partition_days(conn)
+    if not days:
+        return []
+    columns = ", ".join(_quoted(conn, [column.name for column in PredictionLog.__table__.columns]))
+    conn.execute(text(f"ALTER TABLE {TABLE_NAME} DETACH PARTITION {DEFAULT_PARTITION}"))
+    for day in days:
+        _create_day_partition(conn, day)
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} RETURNING {columns}) "
+        f"INSERT INTO {TABLE_NAME} ({columns}) SELECT {columns} FROM moved"
+    )).rowcount
+    conn.execute(text(f"ALTER TABLE {TABLE_NAME} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.info(f"Moved {moved} prediction logs of {len(days)} days out of {DEFAULT_PARTITION}")
+    return days
+
+def convert_to_partitioned(engine: Engine) -> int:
+    """
+    Convert an existing unpartitioned prediction_logs in one transaction
+
+    create_all only creates missing tables, so the old table is renamed
+    aside (its indexes dropped and primary key renamed to free their names),
+    the partitioned table and a partition for every day of data are created,
+    the rows are copied and the old table is dropped. Returns the rows copied.
+    """
+    table = PredictionLog.__table__
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql" or is_partitioned(conn):
+            logger.info(f"{TABLE_NAME} needs no conversion")
+            return 0
+
+        conn.execute(text(f"ALTER TABLE {TABLE_NAME} RENAME TO {UNPARTITIONED_TABLE}"))
+        indexes = conn.scalars(text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = to_regclass(:table) AND NOT i.indisprimary"
+        ), {"table": UNPARTITIONED_TABLE}).all()
+        for index in indexes:
+            conn.execute(text(f'DROP INDEX "{index}"'))
+        primary_key = conn.scalar(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table) AND contype = 'p'"
+        ), {"table": UNPARTITIONED_TABLE})
+        if primary_key:
+            conn.execute(text(f'ALTER TABLE {UNPARTITIONED_TABLE} RENAME CONSTRAINT "{primary_key}" TO {UNPARTITIONED_TABLE}_pkey'))
+
+        table.create(conn)
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE_NAME} DEFAULT"))
+        days = conn.scalars(text(
+            f"SELECT DISTINCT CAST(timestamp AS date) FROM {UNPARTITIONED_TABLE} WHERE timestamp IS NOT NULL"
+        )).all()
+        for day in days:
+            _create_day_partition(conn, day)
+        ensure_partitions(conn)
+
+        # Older deployments may lack later columns; those stay NULL
+        existing = set(conn.scalars(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = :table"
+        ), {"table": UNPARTITIONED_TABLE}))
+        names = [column.name for column in table.columns if column.name in existing]
+        quoted = _quoted(conn, names)
+        # The partition key cannot be NULL; such rows land on the day of the conversion
+        source = [
+            f"COALESCE({column}, now() AT TIME ZONE 'utc')" if name == "timestamp" else column
+            for name, column in zip(names, quoted)
+        ]
+        rows = conn.execute(text(
+            f"INSERT INTO {TABLE_NAME} ({', '.join(quoted)}) SELECT {', '.join(source)} FROM {UNPARTITIONED_TABLE}"
+        )).rowcount
+        conn.execute(text(f"DROP TABLE {UNPARTITIONED_TABLE}"))
+    logger.info(f"Converted {TABLE_NAME} to daily partitions, {rows} rows copied")
+    return rows
+
+def _archive_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.string()),
+        ("user_id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("model_version", pa.string()),
+        ("predicted_class", pa.string()),
+        ("confidence", pa.float64()),
+        ("corrected_class", pa.string()),
+        # JSON columns are kept as their JSON text
+        ("metadata", pa.string()),
+        ("image_path", pa.string()),
+        ("severity", pa.string()),
+        ("treatment_plan", pa.string()),
+    ])
+
+def archive_day(conn: Connection, day: date, archive_root: str = PREDICTION_LOG_ARCHIVE_PATH) -> int:
+    """Write the logs of one day to Parquet, streaming from a server-side cursor; returns the row count"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = PredictionLog.__table__
+    columns = [
+        cast(column, Text).label(column.name) if isinstance(column.type, JSON) else column
+        for column in table.columns
+    ]
+    start = datetime.combine(day, datetime.min.time())
+    # Options on the statement only: Connection.execution_options() would stream every later statement too
+    result = conn.execute(
+        select(*columns).where(table.c.timestamp >= start, table.c.timestamp < start + timedelta(days=1)),
+        execution_options={"stream_results": True, "yield_per": ARCHIVE_BATCH_SIZE}
+    )
+
+    schema = _archive_schema()
+    directory = os.path.join(archive_root, f"date={day.isoformat()}")
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".parquet")
+    os.close(fd)
+    rows = 0
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for chunk in result.partitions():
+                batch = pa.RecordBatch.from_pylist([row._asdict() for row in chunk], schema=schema)
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        # Only a complete file ever appears under the final name
+        os.replace(tmp_path, os.path.join(directory, ARCHIVE_FILE))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rows
+
+def archive_expired_partitions(
+    engine: Engine,
+    retention_days: int = PREDICTION_LOG_RETENTION_DAYS,
+    today: Optional[date] = None,
+    archive_root: str = PREDICTION_LOG_ARCHIVE_PATH
+) -> List[str]:
+    """Archive and drop the daily partitions that ended more than retention_days ago"""
+    cutoff = (today or datetime.utcnow().date()) - timedelta(days=retention_days)
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return []
+        expired = [(name, day) for name, day in list_partitions(conn) if day < cutoff]
+
+    archived = []
+    for name, day in expired:
+        with engine.begin() as conn:
+            # The file is complete before the drop commits; a failed run leaves the partition in place
+            rows = archive_day(conn, day, archive_root)
+            conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"Archived {rows} prediction logs of {day} and dropped {name}")
+        archived.append(name)
+    return archived
+
+def maintain_partitions(engine: Engine) -> List[str]:
+    """Split the default partition, create upcoming partitions and archive expired ones"""
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            split_default_partition(conn)
+        ensure_partitions(conn)
+    return archive_expired_partitions(engine)
+
+def archive_files(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    archive_root: str = PREDICTION_LOG_ARCHIVE_PATH
+) -> List[str]:
+    """Archive files of the days in [start, end), oldest first"""
+    files = []
+    for path in sorted(glob.glob(os.path.join(archive_root, "date=*", ARCHIVE_FILE))):
+        day = date.fromisoformat(os.path.basename(os.path.dirname(path))[len("date="):])
+        if (start is None or day >= start) and (end is None or day < end):
+            files.append(path)
+    return files
+
+def iter_archived_logs(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    columns: Optional[Sequence[str]] = None,
+    filters: Optional[list] = None,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    archive_root: str = PREDICTION_LOG_ARCHIVE_PATH
+) -> Iterator["pyarrow.RecordBatch"]:
+    """
+    Stream archived logs as Arrow record batches
+
+    Only the days in [start, end) are opened and only the requested
+    columns are read. filters use the pyarrow.parquet syntax, e.g.
+    [("model_version", "=", "1.0.0"), ("predicted_class", "in", classes)].
+    """
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    files = archive_files(start, end, archive_root)
+    if not files:
+        return
+    dataset = ds.dataset(files, format="parquet", schema=_archive_schema())
+    expression = pq.filters_to_expression(filters) if filters else None
+    yield from dataset.to_batches(columns=list(columns) if columns else None, filter=expression, batch_size=batch_size)
+
+def read_archived_logs(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    columns: Optional[Sequence[str]] = None,
+    filters: Optional[list] = None,
+    archive_root: str = PREDICTION_LOG_ARCHIVE_PATH
+) -> "pyarrow.Table":
+    """Archived logs as one Arrow table (call .to_pandas() for a DataFrame)"""
+    import pyarrow as pa
+
+    schema = _archive_schema()
+    if columns:
+        schema = pa.schema([schema.field(name) for name in columns])
+    batches = list(iter_archived_logs(start, end, columns, filters, archive_root=archive_root))
+    return pa.Table.from_batches(batches, schema=schema)
@@ -0,0 +1,240 @@
+"""
+Log Export - Incremental Parquet export of prediction and feedback logs
+
+Each run streams the rows logged since the previous run out of Postgres
+with a server-side cursor and appends them as new Parquet files, laid out
+for offline consumers as
+
+    <export>/<dataset>/date=YYYY-MM-DD/model_version=<version>/part-<window>.parquet
+
+Two datasets are written: "predictions" (each prediction left-joined with
+its feedback, one row per feedback) and "feedback" (each feedback with the
+prediction it corrects), so feedback given after a prediction was exported
+still reaches the files. The high-water mark of each dataset is kept in
+<export>/_state.json and only moves once the run's files are in place.
+"""
+import json
+import logging
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Sequence
+from urllib.parse import quote
+
+from sqlalchemy import Text, cast, select
+from sqlalchemy.engine import Engine
+
+from backend.config import LOG_EXPORT_PATH, LOG_EXPORT_LATENESS_SECONDS
+from backend.models.feedback import UserFeedback
+from backend.models.prediction import PredictionLog
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "_state.json"
+EXPORT_BATCH_SIZE = 10000
+DATASETS = ("predictions", "feedback")
+# Start of the first export window when nothing has been exported yet
+EPOCH = datetime(1970, 1, 1)
+
+def _schemas():
+    import pyarrow as pa
+    # date and model_version are encoded in the directory names
+    return {
+        "predictions": pa.schema([
+            ("id", pa.string()),
+            ("user_id", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("predicted_class", pa.string()),
+            ("confidence", pa.float64()),
+            ("corrected_class", pa.string()),
+            ("severity", pa.string()),
+            ("metadata", pa.string()),
+            ("image_path", pa.string()),
+            ("feedback_id", pa.string()),
+            ("feedback_user_id", pa.string()),
+            ("feedback_correct_class", pa.string()),
+            ("feedback_timestamp", pa.timestamp("us")),
+        ]),
+        "feedback": pa.schema([
+            ("id", pa.string()),
+            ("prediction_id", pa.string()),
+            ("user_id", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("correct_class", pa.string()),
+            ("comments", pa.string()),
+            ("predicted_class", pa.string()),
+            ("confidence", pa.float64()),
+            ("prediction_timestamp", pa.timestamp("us")),
+        ]),
+    }
+
+def _queries(start: datetime, end: datetime):
+    """Per dataset, the select of the rows dated in [start, end)"""
+    predictions = (
+        select(
+            PredictionLog.id, PredictionLog.user_id, PredictionLog.timestamp, PredictionLog.model_version,
+            PredictionLog.predicted_class, PredictionLog.confidence, PredictionLog.corrected_class,
+            PredictionLog.severity, cast(PredictionLog.__table__.c.metadata, Text).label("metadata"),
+            PredictionLog.image_path,
+            UserFeedback.id.label("feedback_id"),
+            UserFeedback.user_id.label("feedback_user_id"),
+            UserFeedback.correct_class.label("feedback_correct_class"),
+            UserFeedback.timestamp.label("feedback_timestamp")
+        )
+        .outerjoin(UserFeedback, UserFeedback.prediction_id == PredictionLog.id)
+        .where(PredictionLog.timestamp >= start, PredictionLog.timestamp < end)
+    )
+    feedback = (
+        select(
+            UserFeedback.id, UserFeedback.prediction_id, UserFeedback.user_id, UserFeedback.timestamp,
+            UserFeedback.correct_class, UserFeedback.comments, PredictionLog.model_version,
+            PredictionLog.predicted_class, PredictionLog.confidence,
+            PredictionLog.timestamp.label("prediction_timestamp")
+        )
+        .outerjoin(PredictionLog, UserFeedback.prediction_id == PredictionLog.id)
+        .where(UserFeedback.timestamp >= start, UserFeedback.timestamp < end)
+    )
+    return {"predictions": predictions, "feedback": feedback}
+
+def load_state(export_root: str = LOG_EXPORT_PATH) -> Dict[str, datetime]:
+    """High-water mark of each dataset"""
+    path = os.path.join(export_root, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {name: datetime.fromisoformat(value) for name, value in json.load(f).items()}
+
+def _save_state(state: Dict[str, datetime], export_root: str):
+    fd, tmp_path = tempfile.mkstemp(dir=export_root, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump({name: value.isoformat() for name, value in state.items()}, f)
+    os.replace(tmp_path, os.path.join(export_root, STATE_FILE))
+
+class _PartitionedWriter:
+    """One open ParquetWriter per (day, model_version) partition of a run"""
+
+    def __init__(self, root: str, schema, file_name: str):
+        self.root = root
+        self.schema = schema
+        self.file_name = file_name
+        self._writers = {}
+        self.rows = 0
+
+    def write(self, day: date, model_version: Optional[str], rows: list):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        key = (day, model_version or "unknown")
+        if key not in self._writers:
+            directory = os.path.join(self.root, f"date={day.isoformat()}", f"model_version={quote(key[1], safe='')}")
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".parquet")
+            os.close(fd)
+            writer = pq.ParquetWriter(tmp_path, self.schema, compression="zstd")
+            self._writers[key] = (writer, tmp_path, os.path.join(directory, self.file_name))
+        self._writers[key][0].write_batch(pa.RecordBatch.from_pylist(rows, schema=self.schema))
+        self.rows += len(rows)
+
+    def commit(self):
+        """Close every file and move it under its final name"""
+        for writer, tmp_path, path in self._writers.values():
+            writer.close()
+            os.replace(tmp_path, path)
+        self._writers = {}
+
+    def abort(self):
+        for writer, tmp_path, _ in self._writers.values():
+            writer.close()
+            os.remove(tmp_path)
+        self._writers = {}
+
+def _export_dataset(engine: Engine, name: str, start: datetime, end: datetime, export_root: str) -> int:
+    """Append the rows of one dataset in [start, end); returns the row count"""
+    schema = _schemas()[name]
+    fields = set(schema.names)
+    # Named after the window, so re-running a window whose state was not saved replaces its files
+    file_name = f"part-{start:%Y%m%dT%H%M%S}-{end:%Y%m%dT%H%M%S}.parquet"
+    writer = _PartitionedWriter(os.path.join(export_root, name), schema, file_name)
+
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(
+                _queries(start, end)[name]
+            )
+            for chunk in result.partitions():
+                partitions = {}
+                for row in chunk:
+                    row = row._asdict()
+                    key = (row["timestamp"].date(), row.pop("model_version"))
+                    partitions.setdefault(key, []).append({k: v for k, v in row.items() if k in fields})
+                for (day, model_version), rows in partitions.items():
+                    writer.write(day, model_version, rows)
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.rows
+
+def export_logs(engine: Engine, now: Optional[datetime] = None, export_root: str = LOG_EXPORT_PATH) -> Dict[str, int]:
+    """
+    Export every dataset from its high-water mark up to now minus the lateness
+
+    The lateness leaves time for rows the write-behind log writer flushes
+    after their timestamp; rows arriving later than that are not exported.
+    """
+    end = (now or datetime.utcnow()) - timedelta(seconds=LOG_EXPORT_LATENESS_SECONDS)
+    os.makedirs(export_root, exist_ok=True)
+    state = load_state(export_root)
+    exported = {}
+    for name in DATASETS:
+        start = state.get(name, EPOCH)
+        if start >= end:
+            exported[name] = 0
+            continue
+        exported[name] = _export_dataset(engine, name, start, end, export_root)
+        state[name] = end
+        _save_state(state, export_root)
+    logger.info(f"Exported logs up to {end.isoformat()}: {exported}")
+    return exported
+
+def read_export(
+    name: str = "predictions",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    model_version: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+    export_root: str = LOG_EXPORT_PATH
+) -> "pyarrow.Table":
+    """
+    Exported rows of the days in [start, end) as one Arrow table
+
+    Only the matching date and model_version directories are read; both are
+    returned as columns alongside the requested ones.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partition_schema = pa.schema([("date", pa.string()), ("model_version", pa.string())])
+    schema = pa.unify_schemas([_schemas()[name], partition_schema])
+    root = os.path.join(export_root, name)
+    if not os.path.isdir(root):
+        table = schema.empty_table()
+        return table.select(list(columns)) if columns else table
+    dataset = ds.dataset(
+        root,
+        format="parquet",
+        schema=schema,
+        partitioning=ds.partitioning(partition_schema, flavor="hive"),
+        # Skips files of a run still being written
+        ignore_prefixes=[".", "_"]
+    )
+
+    expression = None
+    for condition in (
+        ds.field("date") >= start.isoformat() if start else None,
+        ds.field("date") < end.isoformat() if end else None,
+        ds.field("model_version") == model_version if model_version else None,
+    ):
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=list(columns) if columns else None, filter=expression)
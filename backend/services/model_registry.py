@@ -0,0 +1,214 @@
+"""
+Model Registry - Versioned artifacts and zero-downtime hot swap
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from backend.config import (
+    INFERENCE_BACKEND, MODEL_VERSION, MODEL_REGISTRY_KEEP, MODEL_REGISTRY_POLL_SECONDS, MODEL_UNLOAD_TIMEOUT_SECONDS
+)
+from backend.core.cache import get_redis_client
+from backend.core.executors import run_blocking, run_model_load
+from backend.services.model_service import BACKENDS, LoadedModel, ModelManager, create_backend, get_model_manager
+
+logger = logging.getLogger(__name__)
+
+# Version every API worker should be serving, shared through Redis
+DESIRED_VERSION_KEY = "model_registry:desired_version"
+
+# Artifact numbers handed out to retraining jobs, claimed once each
+ARTIFACT_CLAIM_KEY = "model_registry:artifact_claim:{base_path}:v{number}"
+
+def list_model_artifacts(base_path: str) -> Dict[str, str]:
+    """Map the base artifact (MODEL_VERSION) and every `<base>.v<n>` next to it (v<n>) to its path"""
+    artifacts = {}
+    if os.path.isfile(base_path):
+        artifacts[MODEL_VERSION] = base_path
+
+    directory = os.path.dirname(base_path) or "."
+    prefix = os.path.basename(base_path) + ".v"
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit():
+                artifacts[f"v{suffix}"] = os.path.join(directory, name)
+    return artifacts
+
+def claim_artifact_number(base_path: str) -> int:
+    """
+    Reserve the next free artifact number n for a new `<base>.v<n>`
+
+    Numbers already on disk are skipped and each number is claimed in Redis
+    with SET NX, so concurrent retraining jobs never write the same artifact.
+    """
+    taken = [int(version[1:]) for version in list_model_artifacts(base_path) if version[1:].isdigit()]
+    number = max(taken, default=0) + 1
+    client = get_redis_client()
+    while not client.set(ARTIFACT_CLAIM_KEY.format(base_path=base_path, number=number), 1, nx=True):
+        number += 1
+    return number
+
+class ModelRegistry:
+    """
+    Tracks versioned model artifacts and the versions resident in memory
+
+    RetrainingPipeline saves new versions next to the base artifact as
+    `<artifact>.v<n>`, which are registered here as version "v<n>"; the base
+    artifact itself is MODEL_VERSION. Activating a version loads and warms
+    it up in the calling thread, then swaps it into ModelManager in one
+    reference assignment. deploy() does this on the dedicated model-load
+    thread, so the inference pool keeps serving the active version
+    meanwhile. Up to `keep` versions stay loaded so a rollback is instant.
+    """
+
+    def __init__(self, model_manager: ModelManager, backend_name: str = INFERENCE_BACKEND, keep: int = MODEL_REGISTRY_KEEP):
+        self.model_manager = model_manager
+        self.backend_name = backend_name
+        self.base_path = BACKENDS[backend_name][1]
+        self.keep = max(1, keep)
+        # Resident versions, least recently active first
+        self._resident: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._activate_lock = threading.Lock()
+
+    def list_artifacts(self) -> Dict[str, str]:
+        """Map every version found on disk to its artifact path"""
+        return list_model_artifacts(self.base_path)
+
+    def register_active(self):
+        """Track the version ModelManager loaded at startup"""
+        active = self.model_manager.active
+        if active is not None:
+            with self._lock:
+                self._resident[active.version] = active
+
+    def load(self, version: str) -> LoadedModel:
+        """Load and warm up a version without activating it"""
+        with self._lock:
+            loaded = self._resident.get(version)
+        if loaded is not None:
+            return loaded
+
+        path = self.list_artifacts().get(version)
+        if path is None:
+            raise ValueError(f"Unknown model version: {version}")
+
+        logger.info(f"Loading model version {version} from {path}")
+        backend = create_backend(self.backend_name, path)
+        backend.load()
+        loaded = LoadedModel(version, backend)
+        loaded.warm_up()
+
+        with self._lock:
+            self._resident[version] = loaded
+        return loaded
+
+    def activate(self, version: str) -> LoadedModel:
+        """Load (if needed), warm up and atomically swap a version into ModelManager"""
+        with self._activate_lock:
+            active = self.model_manager.active
+            if active is not None and active.version == version:
+                return active
+
+            loaded = self.load(version)
+            self.model_manager.swap(loaded)
+
+            with self._lock:
+                self._resident.move_to_end(version)
+                evicted = self._evict()
+
+        # Evicted versions drain their queues; requests holding a reference finish normally
+        for old in evicted:
+            self._unload(old)
+        return loaded
+
+    def _unload(self, loaded: LoadedModel, timeout: float = MODEL_UNLOAD_TIMEOUT_SECONDS):
+        """Stop a version's scheduler, waiting at most timeout for its queue to drain"""
+        logger.info(f"Unloading model version {loaded.version}")
+        if not loaded.close(timeout):
+            logger.warning(f"Model version {loaded.version} still draining after {timeout}s; leaving it to finish")
+
+    def _evict(self) -> List[LoadedModel]:
+        """Drop the least recently active versions beyond `keep`"""
+        evicted = []
+        while len(self._resident) > self.keep:
+            version, loaded = next(iter(self._resident.items()))
+            if loaded is self.model_manager.active:
+                break
+            del self._resident[version]
+            evicted.append(loaded)
+        return evicted
+
+    def rollback_target(self) -> Optional[str]:
+        """Most recently active resident version other than the current one"""
+        active_version = self.model_manager.model_version
+        with self._lock:
+            candidates = [v for v in self._resident if v != active_version]
+        return candidates[-1] if candidates else None
+
+    def status(self) -> dict:
+        """Active, resident and available versions"""
+        with self._lock:
+            resident = [
+                {"version": v, "backend": m.backend.name, "loaded_at": m.loaded_at.isoformat()}
+                for v, m in self._resident.items()
+            ]
+        return {
+            "active_version": self.model_manager.model_version,
+            "resident": resident,
+            "available": sorted(self.list_artifacts()),
+            "rollback_target": self.rollback_target()
+        }
+
+    def close(self):
+        """Stop the schedulers of every resident version"""
+        with self._lock:
+            resident = list(self._resident.values())
+            self._resident.clear()
+        for loaded in resident:
+            self._unload(loaded)
+
+    # Cluster-wide deployment: the desired version is stored in Redis and
+    # every worker converges onto it from its watch loop
+
+    def set_desired_version(self, version: str):
+        get_redis_client().set(DESIRED_VERSION_KEY, version)
+
+    def get_desired_version(self) -> Optional[str]:
+        return get_redis_client().get(DESIRED_VERSION_KEY)
+
+    async def deploy(self, version: str) -> LoadedModel:
+        """
+        Load, warm up and swap a version without blocking the event loop
+
+        Runs on the model-load thread rather than the inference pool, so live
+        micro-batches are not stuck behind the load and draining the evicted
+        version never waits on the pool thread it is running on.
+        """
+        return await run_model_load(self.activate, version)
+
+    async def watch(self, interval: float = MODEL_REGISTRY_POLL_SECONDS):
+        """Background loop that swaps this worker onto the desired version"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                desired = await run_blocking(self.get_desired_version)
+                if desired and desired != self.model_manager.model_version:
+                    logger.info(f"Desired model version changed to {desired}")
+                    await self.deploy(desired)
+            except Exception as e:
+                logger.error(f"Model registry watch error: {e}")
+
+# Singleton instance, created on first use
+_model_registry: Optional[ModelRegistry] = None
+
+def get_model_registry() -> ModelRegistry:
+    """Get model registry instance"""
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = ModelRegistry(get_model_manager())
+    return _model_registry
@@ -1,47 +1,649 @@
 """
 Model Service - Handles model loading and predictions
 """
-import tensorflow as tf
 import numpy as np
 from PIL import Image
+import asyncio
+import base64
 import logging
-from backend.config import CLASS_NAMES, MODEL_PATH, MODEL_VERSION
+import queue
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List, Optional
+from backend.config import (
+    CLASS_NAMES, MODEL_PATH, MODEL_VERSION,
+    INFERENCE_BACKEND, TFLITE_MODEL_PATH, ONNX_MODEL_PATH, INFERENCE_NUM_THREADS,
+    TF_SERVING_URL, TF_SERVING_MODEL_NAME, TF_SERVING_SIGNATURE,
+    TF_SERVING_TIMEOUT, TF_SERVING_POOL_SIZE,
+    INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, INFERENCE_POOL_SIZE, WARMUP_BATCH_SIZES,
+    DRIFT_MONITORING_ENABLED, DRIFT_WINDOW_SIZE, DRIFT_WINDOW_BUCKETS, DRIFT_HISTOGRAM_BINS,
+    DRIFT_THRESHOLD, DRIFT_BASELINE_PATH
+)
+from backend.core.executors import get_inference_pool
 from backend.schemas.common import SeverityLevel
+from backend.services import preprocessing
 
 logger = logging.getLogger(__name__)
 
+class InferenceBackend:
+    """
+    Common interface for the runtimes that can execute the model
+
+    Every backend takes preprocessed images shaped (N, 128, 128, 3) and
+    returns class probabilities shaped (N, len(CLASS_NAMES)). input_dtype is
+    what preprocessing should produce: float32 scaled to [0, 1], or uint8
+    pixels when the model rescales in-graph.
+    """
+    name = "base"
+    input_dtype = np.float32
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        # Keras model object, only available on backends that can run Grad-CAM
+        self.model = None
+
+    def load(self):
+        """Load the model artifact"""
+        raise NotImplementedError
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        """Predict a batch of preprocessed images"""
+        raise NotImplementedError
+
+    def predict(self, tensor: np.ndarray) -> np.ndarray:
+        """Predict a single preprocessed (128, 128, 3) image"""
+        return self.predict_batch(np.expand_dims(tensor, axis=0))[0]
+
+class KerasBackend(InferenceBackend):
+    """Full Keras model executed by TensorFlow"""
+    name = "keras"
+
+    def load(self):
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(self.model_path)
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        # predict_on_batch skips the per-call tf.data pipeline that model.predict builds
+        return np.asarray(self.model.predict_on_batch(batch))
+
+def padded_batch_sizes(max_batch_size: int = INFERENCE_MAX_BATCH_SIZE) -> List[int]:
+    """Powers of two below max_batch_size, then max_batch_size itself"""
+    sizes = []
+    size = 1
+    while size < max_batch_size:
+        sizes.append(size)
+        size *= 2
+    sizes.append(max(1, max_batch_size))
+    return sizes
+
+class TFLiteBackend(InferenceBackend):
+    """
+    TensorFlow Lite flatbuffer produced by ml/export/tflite_converter.py
+
+    Resizing the input and re-allocating tensors costs far more than running
+    a few padding rows, so each batch is padded up to the next of a small set
+    of fixed sizes. Every size gets its own interpreter, allocated once on
+    first use and sharing the loaded flatbuffer.
+    """
+    name = "tflite"
+
+    def __init__(self, model_path: str, max_batch_size: int = INFERENCE_MAX_BATCH_SIZE):
+        super().__init__(model_path)
+        self.batch_sizes = padded_batch_sizes(max_batch_size)
+        self._model_content = None
+        self._input = None
+        self._output = None
+        # batch size -> (interpreter, input details, output details, input buffer, lock)
+        self._interpreters: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        with open(self.model_path, "rb") as f:
+            self._model_content = f.read()
+        self._interpreters = {}
+        # Fails fast on a broken artifact and provides the quantization parameters
+        _, self._input, self._output, _, _ = self._interpreter(self.batch_sizes[0])
+
+    def _create_interpreter(self):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        return Interpreter(model_content=self._model_content, num_threads=INFERENCE_NUM_THREADS)
+
+    def _interpreter(self, batch_size: int) -> tuple:
+        """Interpreter allocated for batch_size, created on first use"""
+        entry = self._interpreters.get(batch_size)
+        if entry is None:
+            with self._lock:
+                entry = self._interpreters.get(batch_size)
+                if entry is None:
+                    interpreter = self._create_interpreter()
+                    input_details = interpreter.get_input_details()[0]
+                    shape = (batch_size,) + tuple(input_details['shape'][1:])
+                    interpreter.resize_tensor_input(input_details['index'], shape)
+                    interpreter.allocate_tensors()
+                    input_details = interpreter.get_input_details()[0]
+                    output_details = interpreter.get_output_details()[0]
+                    buffer = np.zeros(shape, dtype=input_details['dtype'])
+                    # The interpreter holds mutable input/output buffers and is not thread-safe
+                    entry = (interpreter, input_details, output_details, buffer, threading.Lock())
+                    self._interpreters[batch_size] = entry
+        return entry
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        max_size = self.batch_sizes[-1]
+        if len(batch) > max_size:
+            return np.concatenate([
+                self.predict_batch(batch[start:start + max_size])
+                for start in range(0, len(batch), max_size)
+            ])
+
+        n = len(batch)
+        size = next(size for size in self.batch_sizes if size >= n)
+        interpreter, input_details, output_details, buffer, lock = self._interpreter(size)
+        with lock:
+            # Rows past n keep whatever an earlier batch left there; their outputs are dropped
+            buffer[:n] = self._quantize(batch)
+            interpreter.set_tensor(input_details['index'], buffer)
+            interpreter.invoke()
+            return self._dequantize(interpreter.get_tensor(output_details['index'])[:n])
+
+    def _quantize(self, batch: np.ndarray) -> np.ndarray:
+        """Map float input onto the integer input of fully quantized models"""
+        dtype = self._input['dtype']
+        if np.issubdtype(dtype, np.floating):
+            return batch.astype(dtype, copy=False)
+        scale, zero_point = self._input['quantization']
+        return np.round(batch / scale + zero_point).astype(dtype)
+
+    def _dequantize(self, output: np.ndarray) -> np.ndarray:
+        """Map integer output of fully quantized models back to probabilities"""
+        if np.issubdtype(output.dtype, np.floating):
+            return output
+        scale, zero_point = self._output['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
+
+class ONNXBackend(InferenceBackend):
+    """ONNX model produced by ml/export/onnx_converter.py, run with ONNX Runtime"""
+    name = "onnx"
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+        self._session = None
+        self._input_name = None
+
+    def load(self):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = INFERENCE_NUM_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(
+            self.model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        inputs = {self._input_name: batch.astype(np.float32, copy=False)}
+        return self._session.run(None, inputs)[0]
+
+class TFServingBackend(InferenceBackend):
+    """
+    Remote inference against TensorFlow Serving's REST API
+
+    Batches are sent to the serving_raw signature added by
+    ml/export/serving_exporter.py as one base64 string of raw uint8 pixels
+    per image, an order of magnitude smaller than .tolist() JSON floats, and
+    needs no TensorFlow in the API process. Requests reuse keep-alive
+    connections from a pooled session.
+    """
+    name = "tf_serving"
+    input_dtype = np.uint8
+
+    def __init__(self, model_path: str):
+        # model_path is the TF Serving base URL for this backend
+        super().__init__(model_path)
+        self.predict_url = f"{model_path.rstrip('/')}/v1/models/{TF_SERVING_MODEL_NAME}:predict"
+        self.status_url = f"{model_path.rstrip('/')}/v1/models/{TF_SERVING_MODEL_NAME}"
+        self._session = None
+
+    def load(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=TF_SERVING_POOL_SIZE,
+            max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504], allowed_methods=None)
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        # Fail fast if the model is not being served
+        response = session.get(self.status_url, timeout=TF_SERVING_TIMEOUT)
+        response.raise_for_status()
+        self._session = session
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        images = self._to_uint8(batch)
+        payload = {
+            "signature_name": TF_SERVING_SIGNATURE,
+            "inputs": {
+                "image_bytes": [{"b64": base64.b64encode(image.tobytes()).decode("ascii")} for image in images]
+            }
+        }
+        response = self._session.post(self.predict_url, json=payload, timeout=TF_SERVING_TIMEOUT)
+        if response.status_code != 200:
+            raise RuntimeError(f"TF Serving prediction failed ({response.status_code}): {response.text}")
+
+        outputs = response.json()["outputs"]
+        # A signature with a single output returns it directly, otherwise keyed by name
+        if isinstance(outputs, dict):
+            outputs = outputs["probabilities"]
+        return np.asarray(outputs, dtype=np.float32)
+
+    @staticmethod
+    def _to_uint8(batch: np.ndarray) -> np.ndarray:
+        """Pack [0, 1] scaled float images back into uint8 pixels"""
+        if batch.dtype == np.uint8:
+            return batch
+        return np.clip(np.rint(batch * 255.0), 0, 255).astype(np.uint8)
+
+# Registered backends and the artifact each one loads by default
+BACKENDS: Dict[str, tuple] = {
+    KerasBackend.name: (KerasBackend, MODEL_PATH),
+    TFLiteBackend.name: (TFLiteBackend, TFLITE_MODEL_PATH),
+    ONNXBackend.name: (ONNXBackend, ONNX_MODEL_PATH),
+    TFServingBackend.name: (TFServingBackend, TF_SERVING_URL),
+}
+
+def create_backend(name: str = INFERENCE_BACKEND, model_path: Optional[str] = None) -> InferenceBackend:
+    """Create the configured inference backend"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    backend_cls, default_path = BACKENDS[name]
+    return backend_cls(model_path or default_path)
+
+class SchedulerStoppedError(RuntimeError):
+    """Work submitted to a scheduler whose model version has been unloaded"""
+
+class InferenceScheduler:
+    """
+    Dynamic micro-batching scheduler
+
+    Preprocessed tensors submitted by concurrent requests are queued and
+    flushed through the model as one batch as soon as either max_batch_size
+    tensors are waiting or max_wait_ms has passed since the first one arrived.
+    Each caller gets its own row of the batch output back through a Future.
+
+    When an executor is given, batches run there with at most
+    max_concurrent_batches in flight; while every slot is busy new requests
+    keep accumulating in the queue and go out as a larger batch.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: float = INFERENCE_MAX_WAIT_MS,
+        executor: Optional[Executor] = None,
+        max_concurrent_batches: int = 1
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor = executor
+        self._slots = threading.Semaphore(max(1, max_concurrent_batches))
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        # Per-thread batch buffers, reused across flushes instead of reallocated
+        self._buffers = threading.local()
+
+    def start(self):
+        """Start the batching thread if it is not already running"""
+        with self._lock:
+            if self._closed:
+                raise SchedulerStoppedError("Inference scheduler has been stopped")
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        """Start the batching thread unless it is running; caller holds _lock"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run,
+                name="inference-scheduler",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = None) -> bool:
+        """
+        Flush queued work and stop the batching thread for good
+
+        Returns False if it is still draining after timeout. Later submits
+        fail instead of starting a new thread.
+        """
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return True
+            # Queued under the lock, so no request can land behind the stop marker
+            self._queue.put(None)
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def submit(self, tensor: np.ndarray) -> Future:
+        """Queue a single preprocessed image (H, W, C) and return its Future"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                future.set_exception(SchedulerStoppedError("Inference scheduler has been stopped"))
+                return future
+            self._queue.put((tensor, future))
+            self._ensure_thread()
+        return future
+
+    def _run(self):
+        """Collect requests into batches until a stop sentinel is received"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            # Wait for a free inference slot before collecting the rest of the batch
+            self._slots.acquire()
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: list):
+        """Hand a collected batch to the executor, or run it inline"""
+        if self.executor is None:
+            self._flush(batch)
+            return
+        try:
+            self.executor.submit(self._flush, batch)
+        except RuntimeError as e:
+            # Executor already shut down
+            self._slots.release()
+            for _, future in batch:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+
+    def _flush(self, batch: list):
+        """Run one batch and free its inference slot"""
+        try:
+            self._run_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _run_batch(self, batch: list):
+        """Run one batch through the model and resolve every Future"""
+        # Drop requests whose callers gave up while queued
+        batch = [(tensor, future) for tensor, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            inputs = self._stack([tensor for tensor, _ in batch])
+            outputs = self.predict_fn(inputs)
+        except Exception as e:
+            logger.error(f"Batched inference failed for {len(batch)} requests: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for i, (_, future) in enumerate(batch):
+            future.set_result(outputs[i])
+
+    def _stack(self, tensors: list) -> np.ndarray:
+        """Copy tensors into this thread's preallocated batch buffer"""
+        first = tensors[0]
+        buffer = getattr(self._buffers, "batch", None)
+        if buffer is None or buffer.shape[1:] != first.shape or buffer.dtype != first.dtype:
+            buffer = np.empty((self.max_batch_size,) + first.shape, dtype=first.dtype)
+            self._buffers.batch = buffer
+        return np.stack(tensors, out=buffer[:len(tensors)])
+
+def create_drift_monitor():
+    """ModelMonitor with streaming drift sketches, or None when disabled or unavailable"""
+    if not DRIFT_MONITORING_ENABLED:
+        return None
+    try:
+        # Imported lazily: the monitoring package pulls in scipy and scikit-learn
+        from monitoring.prometheus.model_monitor import ModelMonitor
+    except ImportError as e:
+        logger.warning(f"Drift monitoring unavailable: {e}")
+        return None
+    monitor = ModelMonitor(drift_threshold=DRIFT_THRESHOLD, window_size=DRIFT_WINDOW_SIZE, n_bins=DRIFT_HISTOGRAM_BINS)
+    detector = monitor.enable_streaming(
+        n_classes=len(CLASS_NAMES),
+        n_bins=DRIFT_HISTOGRAM_BINS,
+        window_buckets=DRIFT_WINDOW_BUCKETS
+    )
+    if DRIFT_BASELINE_PATH:
+        try:
+            detector.load_baseline(DRIFT_BASELINE_PATH)
+        except Exception as e:
+            logger.warning(f"Could not load drift baseline {DRIFT_BASELINE_PATH}: {e}")
+    return monitor
+
+class LoadedModel:
+    """
+    One model version resident in memory
+
+    Each version owns its backend and its own batching scheduler, so requests
+    that started on it keep running on it even after another version has
+    been swapped in.
+    """
+
+    def __init__(self, version: str, backend: InferenceBackend):
+        self.version = version
+        self.backend = backend
+        self.model = backend.model
+        self.loaded_at = datetime.utcnow()
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
+        self.drift_monitor = create_drift_monitor()
+        self.scheduler = InferenceScheduler(
+            self.predict_batch,
+            executor=get_inference_pool(),
+            max_concurrent_batches=INFERENCE_POOL_SIZE
+        )
+
+    def warm_up(self, batch_sizes: List[int] = WARMUP_BATCH_SIZES):
+        """Run dummy batches so graph tracing and allocation happen before real traffic"""
+        for batch_size in batch_sizes:
+            started = time.monotonic()
+            dummy = np.zeros((batch_size,) + preprocessing.INPUT_SHAPE, dtype=self.backend.input_dtype)
+            self.backend.predict_batch(dummy)
+            logger.info(f"Warm-up of {self.version} with batch {batch_size} took {time.monotonic() - started:.3f}s")
+        if self.supports_explainability and batch_sizes:
+            # Build and trace the Grad-CAM function once so the first explained request is not slow
+            started = time.monotonic()
+            dummy = np.zeros((batch_sizes[0],) + preprocessing.INPUT_SHAPE, dtype=np.float32)
+            try:
+                self.explain(dummy, [0] * batch_sizes[0])
+                logger.info(f"Grad-CAM warm-up of {self.version} took {time.monotonic() - started:.3f}s")
+            except Exception as e:
+                logger.warning(f"Grad-CAM unavailable for {self.version}: {e}")
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        """Run the backend on a batch and feed the output to the drift sketches"""
+        probabilities = self.backend.predict_batch(batch)
+        if self.drift_monitor is not None:
+            try:
+                self.drift_monitor.update(probabilities)
+            except Exception as e:
+                logger.error(f"Drift sketch update failed: {e}")
+        return probabilities
+
+    @property
+    def supports_explainability(self) -> bool:
+        # Grad-CAM needs gradients, so it is only available on the in-process Keras backend
+        return self.model is not None
+
+    @property
+    def explainer(self):
+        """Grad-CAM engine for this version, built on first use"""
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    from backend.services.explainability import GradCamEngine
+                    self._explainer = GradCamEngine(self.model)
+        return self._explainer
+
+    def explain(self, images: np.ndarray, class_indices: List[int]) -> np.ndarray:
+        """Grad-CAM heatmaps shaped (N, h, w) for already preprocessed images"""
+        return self.explainer.compute(images, class_indices)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Let queued requests finish, then stop the scheduler; False if still draining after timeout"""
+        return self.scheduler.stop(timeout)
+
 class ModelManager:
     def __init__(self):
-        self.model = None
-        self.model_version = MODEL_VERSION
-        self.load_model()
-        
+        # load_model() is called from the application lifespan, not here,
+        # so constructing the manager stays cheap
+        self.active: Optional[LoadedModel] = None
+        self._default_backend = create_backend()
+        self._swap_lock = threading.Lock()
+        self._swap_listeners: List[Callable[[LoadedModel], None]] = []
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self.active is not None
+    
+    @property
+    def model_version(self) -> str:
+        return self.active.version if self.active else MODEL_VERSION
+    
+    @property
+    def model(self):
+        return self.active.model if self.active else None
+    
+    @property
+    def backend(self) -> InferenceBackend:
+        return self.active.backend if self.active else self._default_backend
+    
     def load_model(self):
-        """Load the TensorFlow model"""
+        """Load the model through the configured inference backend"""
         try:
-            self.model = tf.keras.models.load_model(MODEL_PATH)
-            logger.info(f"Model loaded successfully - Version {self.model_version}")
+            self._default_backend.load()
+            self.swap(LoadedModel(MODEL_VERSION, self._default_backend))
+            logger.info(f"Model loaded successfully - Version {self.model_version} ({self.backend.name} backend)")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
     
+    def swap(self, loaded: LoadedModel) -> Optional[LoadedModel]:
+        """
+        Atomically make a loaded version the active one
+
+        Returns the previously active version, which stays usable for
+        requests already running on it.
+        """
+        with self._swap_lock:
+            previous, self.active = self.active, loaded
+        logger.info(f"Active model version is now {loaded.version}")
+        for listener in self._swap_listeners:
+            try:
+                listener(loaded)
+            except Exception as e:
+                logger.error(f"Swap listener failed: {e}")
+        return previous
+    
+    def add_swap_listener(self, listener: Callable[[LoadedModel], None]):
+        """Call listener with the new version after every swap"""
+        self._swap_listeners.append(listener)
+    
+    def warm_up(self, batch_sizes: List[int] = WARMUP_BATCH_SIZES):
+        """Warm up the active version"""
+        self.active.warm_up(batch_sizes)
+    
+    def shutdown(self):
+        """Drain queued inference work on the active version"""
+        if self.active is not None:
+            self.active.close()
+    
     def preprocess_image(self, image: Image.Image) -> np.ndarray:
         """Preprocess image for prediction"""
-        image = image.resize((128, 128))
-        image_array = np.array(image) / 255.0
-        return np.expand_dims(image_array, axis=0)
+        tensor = preprocessing.preprocess_image(image, dtype=self.backend.input_dtype)
+        return np.expand_dims(tensor, axis=0)
+    
+    def predict_batch(self, batch: np.ndarray, loaded: Optional[LoadedModel] = None) -> np.ndarray:
+        """Run the model on a batch of preprocessed images"""
+        loaded = loaded or self.active
+        return loaded.predict_batch(batch)
+    
+    def decode_prediction(self, probabilities: np.ndarray, probability_format: str = "dict", top_k: int = 5) -> tuple:
+        """
+        Turn one row of model output into class, confidence and probabilities
+        
+        probability_format selects how the probabilities are returned:
+        "dict" maps every class name to its probability, "array" is a plain
+        list in CLASS_NAMES order and "top_k" lists the k most likely classes.
+        """
+        predicted_idx = int(np.argmax(probabilities))
+        confidence = float(probabilities[predicted_idx])
+        
+        if probability_format == "array":
+            probs = probabilities.tolist()
+        elif probability_format == "top_k":
+            k = max(1, min(top_k, len(CLASS_NAMES)))
+            top = np.argpartition(probabilities, -k)[-k:]
+            top = top[np.argsort(probabilities[top])[::-1]]
+            probs = [{"class_name": CLASS_NAMES[i], "probability": float(probabilities[i])} for i in top]
+        else:
+            probs = dict(zip(CLASS_NAMES, probabilities.tolist()))
+        
+        return CLASS_NAMES[predicted_idx], confidence, probs
     
     def predict(self, image: Image.Image) -> tuple:
         """Make prediction and return class and confidence"""
         processed_image = self.preprocess_image(image)
-        predictions = self.model.predict(processed_image)
-        predicted_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][predicted_idx])
-        
-        # Get all probabilities
-        all_probs = {CLASS_NAMES[i]: float(predictions[0][i]) for i in range(len(CLASS_NAMES))}
-        
-        return CLASS_NAMES[predicted_idx], confidence, all_probs
+        predictions = self.predict_batch(processed_image)
+        return self.decode_prediction(predictions[0])
+    
+    async def predict_async(self, image: Image.Image) -> tuple:
+        """Make prediction through the micro-batching scheduler"""
+        processed_image = self.preprocess_image(image)
+        return await self.predict_tensor_async(processed_image[0])
+    
+    async def predict_tensor_async(
+        self,
+        tensor: np.ndarray,
+        loaded: Optional[LoadedModel] = None,
+        probability_format: str = "dict",
+        top_k: int = 5
+    ) -> tuple:
+        """Predict a single preprocessed (128, 128, 3) tensor without blocking the event loop"""
+        loaded = loaded or self.active
+        future = loaded.scheduler.submit(tensor)
+        probabilities = await asyncio.wrap_future(future)
+        return self.decode_prediction(probabilities, probability_format, top_k)
     
     def estimate_severity(self, predicted_class: str, confidence: float, metadata: dict) -> str:
         """Estimate disease severity based on prediction and metadata"""
@@ -58,9 +660,15 @@ class ModelManager:
         else:
             return SeverityLevel.HEALTHY
 
-# Singleton instance
-model_manager = ModelManager()
+# Singleton instance, created on first use
+model_manager: Optional[ModelManager] = None
+_model_manager_lock = threading.Lock()
 
 def get_model_manager() -> ModelManager:
     """Get model manager instance"""
+    global model_manager
+    if model_manager is None:
+        with _model_manager_lock:
+            if model_manager is None:
+                model_manager = ModelManager()
     return model_manager
\ No newline at end of file
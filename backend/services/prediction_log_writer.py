@@ -0,0 +1,141 @@
+"""
+Prediction Log Writer - Write-behind persistence of PredictionLog rows
+"""
+import asyncio
+import logging
+from typing import Iterable, List, Optional
+
+from sqlalchemy import insert
+
+from backend.config import (
+    PREDICTION_LOG_QUEUE_SIZE, PREDICTION_LOG_BATCH_SIZE,
+    PREDICTION_LOG_FLUSH_SECONDS, PREDICTION_LOG_MAX_RETRIES
+)
+from backend.database import async_engine
+from backend.models.prediction import PredictionLog
+from backend.services.analytics_rollups import record_predictions
+
+logger = logging.getLogger(__name__)
+
+# Queued by close() to tell the flush loop to write what it holds and exit
+_STOP = object()
+
+class PredictionLogWriter:
+    """
+    Queue prediction log rows in-process and write them in bulk
+
+    Requests enqueue a row and respond without waiting for Postgres. A
+    background task drains the queue into multi-row inserts whenever
+    batch_size rows are waiting or flush_interval seconds have passed. The
+    queue is bounded: if the database falls behind, submit() waits for room
+    instead of letting memory grow. close() flushes everything still queued.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = PREDICTION_LOG_QUEUE_SIZE,
+        batch_size: int = PREDICTION_LOG_BATCH_SIZE,
+        flush_interval: float = PREDICTION_LOG_FLUSH_SECONDS,
+        max_retries: int = PREDICTION_LOG_MAX_RETRIES
+    ):
+        self.max_queue_size = max_queue_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max(1, max_retries)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        """Rows queued but not yet written"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Start the flush loop on the running event loop"""
+        if self._task is None:
+            self._closing = False
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, row: dict):
+        """Queue one row, waiting while the queue is full"""
+        if self._task is None or self._closing:
+            raise RuntimeError("Prediction log writer is not running")
+        await self._queue.put(row)
+
+    async def submit_many(self, rows: Iterable[dict]):
+        """Queue several rows, waiting while the queue is full"""
+        for row in rows:
+            await self.submit(row)
+
+    async def close(self):
+        """Stop accepting rows, flush everything queued and stop the loop"""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            rows = []
+            deadline = loop.time() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if rows:
+                await self._flush(rows)
+
+    async def _flush(self, rows: List[dict]):
+        """Write one batch, retrying with backoff before giving up on it"""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await _insert_rows(rows)
+                break
+            except Exception as e:
+                logger.error(f"Writing {len(rows)} prediction logs failed (attempt {attempt}/{self.max_retries}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(2 ** attempt, 30))
+        else:
+            logger.error(f"Dropped {len(rows)} prediction logs after {self.max_retries} attempts")
+            return
+        
+        # Count only rows that were persisted, so the rollups match the table
+        try:
+            await record_predictions(rows)
+        except Exception as e:
+            logger.error(f"Updating analytics rollups failed: {e}")
+
+async def _insert_rows(rows: List[dict]):
+    """Insert many PredictionLog rows in one statement and commit"""
+    async with async_engine.begin() as conn:
+        await conn.execute(insert(PredictionLog.__table__), rows)
+
+# Singleton instance, started from the application lifespan
+prediction_log_writer = PredictionLogWriter()
+
+def get_prediction_log_writer() -> PredictionLogWriter:
+    """Get prediction log writer instance"""
+    return prediction_log_writer
@@ -0,0 +1,89 @@
+"""
+Image Preprocessing - Shared decode and resize logic
+
+Used by the API, the TF Serving example client and the Streamlit app so
+every entry point feeds the model identically prepared pixels.
+"""
+import io
+import numpy as np
+from PIL import Image
+from typing import Iterable, Optional, Sequence
+
+IMAGE_SIZE = (128, 128)
+INPUT_SHAPE = (IMAGE_SIZE[1], IMAGE_SIZE[0], 3)
+RESAMPLE = Image.BILINEAR
+_SCALE = np.float32(1.0 / 255.0)
+
+def decode_image(source) -> Image.Image:
+    """
+    Decode image bytes, a path or a file object into an RGB image
+
+    JPEGs are decoded in draft mode, which lets libjpeg downscale by 1/2, 1/4
+    or 1/8 while decoding, so a 12 MP phone photo is never materialised at
+    full resolution before the final resize.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    if image.format == 'JPEG':
+        image.draft('RGB', IMAGE_SIZE)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+def preprocess_image(
+    image: Image.Image,
+    out: Optional[np.ndarray] = None,
+    dtype=np.float32,
+    scale: bool = True
+) -> np.ndarray:
+    """
+    Resize an image into a single (128, 128, 3) model input
+
+    float32 output is scaled to [0, 1] in one pass straight from the uint8
+    pixels; uint8 output is left unscaled for models that rescale in-graph.
+    If out is given the result is written into it (e.g. a row of a
+    preallocated batch) instead of allocating.
+    """
+    if image.size != IMAGE_SIZE:
+        image = image.resize(IMAGE_SIZE, RESAMPLE)
+    pixels = np.asarray(image, dtype=np.uint8)
+
+    if out is None:
+        out = np.empty(INPUT_SHAPE, dtype=dtype)
+    if np.issubdtype(out.dtype, np.floating) and scale:
+        np.multiply(pixels, _SCALE, out=out, casting='unsafe')
+    else:
+        np.copyto(out, pixels, casting='unsafe')
+    return out
+
+def preprocess_batch(
+    images: Sequence[Image.Image],
+    out: Optional[np.ndarray] = None,
+    dtype=np.float32,
+    scale: bool = True
+) -> np.ndarray:
+    """Preprocess many images into one preallocated (N, 128, 128, 3) buffer"""
+    if out is None:
+        out = np.empty((len(images),) + INPUT_SHAPE, dtype=dtype)
+    for i, image in enumerate(images):
+        preprocess_image(image, out=out[i], scale=scale)
+    return out[:len(images)]
+
+def load_image_tensor(source, dtype=np.float32, scale: bool = True, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Decode and preprocess one image in a single step"""
+    return preprocess_image(decode_image(source), out=out, dtype=dtype, scale=scale)
+
+def load_image_batch(
+    sources: Iterable,
+    out: Optional[np.ndarray] = None,
+    dtype=np.float32,
+    scale: bool = True
+) -> np.ndarray:
+    """Decode and preprocess many images into one batch buffer"""
+    sources = list(sources)
+    if out is None:
+        out = np.empty((len(sources),) + INPUT_SHAPE, dtype=dtype)
+    for i, source in enumerate(sources):
+        load_image_tensor(source, scale=scale, out=out[i])
+    return out[:len(sources)]
@@ -1,13 +1,13 @@
 import streamlit as st
 import tensorflow as tf
 import numpy as np
+from backend.services.preprocessing import load_image_tensor
 
 # TensorFlow Model Prediction
 def model_prediction(test_image):
     model = load_model()  # Load the pre-trained model
     # Preprocess the input image
-    image = tf.keras.preprocessing.image.load_img(test_image, target_size=(128, 128))
-    input_arr = np.expand_dims(tf.keras.preprocessing.image.img_to_array(image), axis=0)
+    input_arr = np.expand_dims(load_image_tensor(test_image, scale=False), axis=0)
     # Predict using the model
     prediction = model.predict(input_arr)
     predicted_index = np.argmax(prediction)
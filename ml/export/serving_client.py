@@ -4,7 +4,7 @@ TensorFlow Serving Client
 
 import requests
 import numpy as np
-from PIL import Image
+from backend.services.preprocessing import load_image_tensor
 
 def create_serving_client():
     """
@@ -19,10 +19,7 @@ def create_serving_client():
         def predict(self, image_path: str):
             """Make prediction using TF Serving"""
             # Load and preprocess image
-            image = Image.open(image_path).convert('RGB')
-            image = image.resize((128, 128))
-            image_array = np.array(image) / 255.0
-            image_array = np.expand_dims(image_array, axis=0)
+            image_array = np.expand_dims(load_image_tensor(image_path), axis=0)
             
             # Prepare request
             url = f"{self.server_url}/v1/models/{self.model_name}:predict"
@@ -23,8 +23,25 @@ def export_model_for_serving(
     export_path = os.path.join(export_dir, str(version))
     Path(export_path).mkdir(parents=True, exist_ok=True)
     
+    # Default signature takes float images scaled to [0, 1]
+    @tf.function(input_signature=[tf.TensorSpec([None, 128, 128, 3], tf.float32, name='images')])
+    def serving_default(images):
+        return {'probabilities': model(images, training=False)}
+    
+    # Binary signature takes raw uint8 pixel bytes (base64 over REST), one string per image
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string, name='image_bytes')])
+    def serving_raw(image_bytes):
+        images = tf.io.decode_raw(image_bytes, tf.uint8)
+        images = tf.reshape(images, [-1, 128, 128, 3])
+        images = tf.cast(images, tf.float32) / 255.0
+        return {'probabilities': model(images, training=False)}
+    
     # Save model in SavedModel format
-    tf.saved_model.save(model, export_path)
+    tf.saved_model.save(
+        model,
+        export_path,
+        signatures={'serving_default': serving_default, 'serving_raw': serving_raw}
+    )
     
     print(f"Model exported to {export_path}")
     
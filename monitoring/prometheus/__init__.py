@@ -2,13 +2,14 @@
 Model Monitoring Package
 """
 
-from monitoring.prometheus.model_monitor import ModelMonitor
+from monitoring.prometheus.model_monitor import ModelMonitor, StreamingDriftDetector
 from monitoring.prometheus.active_learning import ActiveLearningManager
 from monitoring.prometheus.retraining_pipeline import RetrainingPipeline
 from monitoring.prometheus.monitoring_dashboard import MonitoringDashboard
 
 __all__ = [
     'ModelMonitor',
+    'StreamingDriftDetector',
     'ActiveLearningManager',
     'RetrainingPipeline',
     'MonitoringDashboard'
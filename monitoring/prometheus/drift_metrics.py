@@ -0,0 +1,180 @@
+"""
+Vectorized Drift Metrics
+NumPy kernels comparing binned distributions for many windows and classes at once
+"""
+
+import numpy as np
+from scipy import stats
+from typing import Dict, Optional, Tuple
+
+EPSILON = 1e-6
+
+
+def histogram(values: np.ndarray, bins: int = 20, value_range: Tuple[float, float] = (0.0, 1.0)) -> np.ndarray:
+    """
+    Fixed-bin histograms along the last axis
+
+    values shaped (..., samples), e.g. windows x classes x samples, give
+    counts shaped (..., bins) from a single bincount; values outside the
+    range are clipped into the first and last bins.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    low, high = value_range
+    idx = np.floor((values - low) / (high - low) * bins).astype(np.intp)
+    np.clip(idx, 0, bins - 1, out=idx)
+
+    rows = int(np.prod(values.shape[:-1], dtype=np.int64))
+    offsets = (np.arange(rows, dtype=np.intp) * bins).reshape(values.shape[:-1] + (1,))
+    counts = np.bincount((idx + offsets).ravel(), minlength=rows * bins)
+    return counts.reshape(values.shape[:-1] + (bins,))
+
+
+def normalize(counts: np.ndarray, epsilon: float = EPSILON) -> np.ndarray:
+    """Counts to probabilities along the last axis, smoothed so no bin is empty"""
+    counts = np.asarray(counts, dtype=np.float64)
+    totals = counts.sum(axis=-1, keepdims=True)
+    p = counts / np.maximum(totals, 1)
+    return (p + epsilon) / (1 + epsilon * counts.shape[-1])
+
+
+def psi(current: np.ndarray, reference: np.ndarray, epsilon: float = EPSILON) -> np.ndarray:
+    """Population Stability Index between count histograms (..., bins), broadcasting"""
+    p = normalize(current, epsilon)
+    q = normalize(reference, epsilon)
+    return np.sum((p - q) * np.log(p / q), axis=-1)
+
+
+def js_divergence(current: np.ndarray, reference: np.ndarray, epsilon: float = EPSILON) -> np.ndarray:
+    """Jensen-Shannon divergence (natural log, at most ln 2) between count histograms"""
+    p = normalize(current, epsilon)
+    q = normalize(reference, epsilon)
+    m = 0.5 * (p + q)
+    return 0.5 * (np.sum(p * np.log(p / m), axis=-1) + np.sum(q * np.log(q / m), axis=-1))
+
+
+def _cdf_gap(current: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """CDF of current minus CDF of reference at each bin's upper edge"""
+    current = np.asarray(current, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    p = current / np.maximum(current.sum(axis=-1, keepdims=True), 1)
+    q = reference / np.maximum(reference.sum(axis=-1, keepdims=True), 1)
+    return np.cumsum(p, axis=-1) - np.cumsum(q, axis=-1)
+
+
+def wasserstein(current: np.ndarray, reference: np.ndarray, bin_width: float = 1.0) -> np.ndarray:
+    """
+    1-Wasserstein (earth mover's) distance between count histograms
+
+    With equal-width bins it is the area between the two CDFs; pass the bin
+    width to get it in units of the binned value (1 / bins for [0, 1]).
+    """
+    return np.sum(np.abs(_cdf_gap(current, reference)), axis=-1) * bin_width
+
+
+def ks_statistic(current: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Kolmogorov-Smirnov statistic between binned CDFs (a lower bound of the exact one)"""
+    return np.max(np.abs(_cdf_gap(current, reference)), axis=-1)
+
+
+def ks_pvalue(statistic: np.ndarray, n_current: np.ndarray, n_reference: np.ndarray) -> np.ndarray:
+    """Asymptotic two-sample KS p-value for the given statistics and sample sizes"""
+    n_current = np.asarray(n_current, dtype=np.float64)
+    n_reference = np.asarray(n_reference, dtype=np.float64)
+    n_effective = n_current * n_reference / np.maximum(n_current + n_reference, 1)
+    return stats.kstwobign.sf(np.sqrt(n_effective) * statistic)
+
+
+def ks_samples(current: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """
+    Exact two-sample KS statistic between raw samples, row by row
+
+    current (..., n) and reference (..., m) share their leading axes. All rows
+    are sorted and searched at once by offsetting each row into its own
+    value range, instead of looping over windows and classes.
+    """
+    current = np.sort(np.asarray(current, dtype=np.float64), axis=-1)
+    reference = np.sort(np.asarray(reference, dtype=np.float64), axis=-1)
+    lead = current.shape[:-1]
+    n, m = current.shape[-1], reference.shape[-1]
+    current = current.reshape(-1, n)
+    reference = reference.reshape(-1, m)
+
+    low = min(current.min(), reference.min())
+    span = max(current.max(), reference.max()) - low + 1.0
+    offsets = (np.arange(current.shape[0]) * span)[:, None]
+    current_flat = (current - low + offsets).ravel()
+    reference_flat = (reference - low + offsets).ravel()
+    points = np.concatenate([current - low + offsets, reference - low + offsets], axis=1)
+
+    rows = np.arange(current.shape[0])[:, None]
+    cdf_current = (np.searchsorted(current_flat, points, side='right') - rows * n) / n
+    cdf_reference = (np.searchsorted(reference_flat, points, side='right') - rows * m) / m
+    return np.max(np.abs(cdf_current - cdf_reference), axis=-1).reshape(lead)
+
+
+def chi_square(current: np.ndarray, reference: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Chi-square test of homogeneity between count vectors, row by row
+
+    Each current/reference pair is a 2 x categories contingency table;
+    categories empty on both sides are left out of the statistic and the
+    degrees of freedom. Returns (statistic, p-value).
+    """
+    current, reference = np.broadcast_arrays(
+        np.asarray(current, dtype=np.float64), np.asarray(reference, dtype=np.float64)
+    )
+    column_totals = current + reference
+    n_current = current.sum(axis=-1, keepdims=True)
+    n_reference = reference.sum(axis=-1, keepdims=True)
+    grand_total = np.maximum(n_current + n_reference, 1)
+    expected_current = n_current * column_totals / grand_total
+    expected_reference = n_reference * column_totals / grand_total
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = (
+            (current - expected_current) ** 2 / expected_current
+            + (reference - expected_reference) ** 2 / expected_reference
+        )
+    statistic = np.sum(np.where(column_totals > 0, terms, 0.0), axis=-1)
+    dof = np.maximum(np.count_nonzero(column_totals, axis=-1) - 1, 1)
+    return statistic, stats.chi2.sf(statistic, dof)
+
+
+def drift_metrics(current: np.ndarray, reference: np.ndarray, bin_width: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    Every metric between count histograms in one call
+
+    current and reference broadcast against each other, e.g. a year of daily
+    windows (365, classes, bins) against one baseline (classes, bins) gives
+    (365, classes) arrays. The bins must be ordered values (probability
+    histograms); unordered categories go through class_mix_metrics().
+    """
+    current = np.asarray(current, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    if bin_width is None:
+        bin_width = 1.0 / current.shape[-1]
+    statistic = ks_statistic(current, reference)
+    return {
+        'psi': psi(current, reference),
+        'js_divergence': js_divergence(current, reference),
+        'wasserstein': wasserstein(current, reference, bin_width),
+        'ks_statistic': statistic,
+        'ks_pvalue': ks_pvalue(statistic, current.sum(axis=-1), reference.sum(axis=-1)),
+    }
+
+
+def class_mix_metrics(current: np.ndarray, reference: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Metrics between predicted-class count vectors (..., classes)
+
+    Class indices have no order, so CDF-based KS and Wasserstein would
+    depend on how classes happen to be numbered; the mix is compared with
+    PSI, JS and a chi-square test instead.
+    """
+    statistic, pvalue = chi_square(current, reference)
+    return {
+        'psi': psi(current, reference),
+        'js_divergence': js_divergence(current, reference),
+        'chi2_statistic': statistic,
+        'chi2_pvalue': pvalue,
+    }
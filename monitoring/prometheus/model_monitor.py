@@ -9,100 +9,297 @@ from sklearn.metrics import accuracy_score, precision_recall_fscore_support
 from scipy import stats
 from datetime import datetime, timedelta
 import logging
-from typing import Dict, List, Tuple
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from monitoring.prometheus import drift_metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Drift alerts kept in memory; older ones are dropped
+MAX_DRIFT_ALERTS = 1000
+
+
+class StreamingDriftDetector:
+    """
+    Constant-memory drift sketches over a stream of prediction batches
+    
+    Every class probability is counted into a fixed-bin histogram on [0, 1]
+    (classes x bins), and the predicted class into a class histogram.
+    Counts go into buckets of bucket_size predictions kept in a ring of
+    2 * window_buckets: the newest window_buckets form the current window,
+    the ones before them the reference window. Memory therefore does not
+    depend on traffic, and the current window can be compared with the
+    previous one or with a baseline histogram at any time.
+    """
+    
+    def __init__(self, n_classes: int = 38, n_bins: int = 20, bucket_size: int = 100,
+                 window_buckets: int = 10, auto_baseline: bool = True):
+        self.n_classes = n_classes
+        self.n_bins = n_bins
+        self.bucket_size = max(1, bucket_size)
+        self.window_buckets = max(1, window_buckets)
+        # Use the first full window as baseline when none has been set
+        self.auto_baseline = auto_baseline
+        slots = 2 * self.window_buckets
+        self._histograms = np.zeros((slots, n_classes, n_bins), dtype=np.int64)
+        self._class_counts = np.zeros((slots, n_classes), dtype=np.int64)
+        self._sizes = np.zeros(slots, dtype=np.int64)
+        self._head = 0
+        self._completed_buckets = 0
+        self.total_predictions = 0
+        self.baseline: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+    
+    def _sketch(self, predictions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Probability and predicted-class histograms of a (N, classes) batch"""
+        histogram = drift_metrics.histogram(predictions.T, self.n_bins)
+        class_counts = np.bincount(np.argmax(predictions, axis=1), minlength=self.n_classes)
+        return histogram, class_counts
+    
+    def update(self, predictions: np.ndarray):
+        """Add a batch of predicted probabilities shaped (N, classes)"""
+        predictions = np.asarray(predictions).reshape(-1, self.n_classes)
+        with self._lock:
+            start = 0
+            while start < len(predictions):
+                take = min(len(predictions) - start, self.bucket_size - int(self._sizes[self._head]))
+                histogram, class_counts = self._sketch(predictions[start:start + take])
+                self._histograms[self._head] += histogram
+                self._class_counts[self._head] += class_counts
+                self._sizes[self._head] += take
+                start += take
+                if self._sizes[self._head] >= self.bucket_size:
+                    self._rotate()
+            self.total_predictions += len(predictions)
+    
+    def _rotate(self):
+        """Close the bucket being filled and start the next one"""
+        self._completed_buckets += 1
+        if self.auto_baseline and self.baseline is None and self._completed_buckets >= self.window_buckets:
+            self.baseline = self._window(0)
+            logger.info("Streaming drift baseline set from the first full window")
+        self._head = (self._head + 1) % len(self._sizes)
+        self._histograms[self._head] = 0
+        self._class_counts[self._head] = 0
+        self._sizes[self._head] = 0
+    
+    def _window(self, first_age: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Summed histograms of window_buckets buckets, starting first_age buckets back"""
+        slots = [(self._head - age) % len(self._sizes) for age in range(first_age, first_age + self.window_buckets)]
+        return self._histograms[slots].sum(axis=0), self._class_counts[slots].sum(axis=0)
+    
+    def set_baseline(self, predictions: Optional[np.ndarray] = None):
+        """Use a reference prediction matrix as baseline, or the current window when None"""
+        with self._lock:
+            if predictions is None:
+                self.baseline = self._window(0)
+            else:
+                self.baseline = self._sketch(np.asarray(predictions).reshape(-1, self.n_classes))
+    
+    def save_baseline(self, path: str):
+        """Save the baseline histograms to an .npz file"""
+        histogram, class_counts = self.baseline
+        np.savez(path, histogram=histogram, class_counts=class_counts)
+    
+    def load_baseline(self, path: str):
+        """Load baseline histograms saved by save_baseline"""
+        with np.load(path) as data:
+            self.baseline = (data['histogram'], data['class_counts'])
+    
+    def compare(self, reference: str = 'baseline') -> Optional[Dict]:
+        """
+        Drift metrics of the current window against 'baseline' or the previous 'window'
+        
+        Returns None until both sides hold predictions.
+        """
+        with self._lock:
+            current = self._window(0)
+            other = self.baseline if reference == 'baseline' else self._window(self.window_buckets)
+        if other is None or current[1].sum() == 0 or other[1].sum() == 0:
+            return None
+        
+        per_class = drift_metrics.drift_metrics(current[0], other[0])
+        class_mix = drift_metrics.class_mix_metrics(current[1], other[1])
+        order = np.argsort(per_class['psi'])[::-1]
+        return {
+            'reference': reference,
+            'window_size': int(current[1].sum()),
+            'reference_size': int(other[1].sum()),
+            'per_class': per_class,
+            'class_mix_psi': float(class_mix['psi']),
+            'class_mix_js_divergence': float(class_mix['js_divergence']),
+            'class_mix_chi2_pvalue': float(class_mix['chi2_pvalue']),
+            'top_drifting_classes': [
+                {'class_index': int(i), 'psi': float(per_class['psi'][i])} for i in order[:5]
+            ]
+        }
+
 
 class ModelMonitor:
     """
     Monitors model performance and detects drift
     """
     
-    def __init__(self, drift_threshold: float = 0.15, window_size: int = 1000):
+    def __init__(self, drift_threshold: float = 0.15, window_size: int = 1000, n_bins: int = 20):
         self.drift_threshold = drift_threshold
         self.window_size = window_size
+        self.n_bins = n_bins
         self.baseline_distribution = None
         self.performance_history = []
         self.drift_alerts = []
+        self.streaming: Optional[StreamingDriftDetector] = None
         
     def set_baseline(self, predictions: np.ndarray, labels: np.ndarray):
         """Set baseline distribution for drift detection"""
+        # Only summaries and per-class histograms are kept, not the baseline matrix itself
+        predictions = np.asarray(predictions)
+        matrix = predictions.reshape(len(predictions), -1)
         self.baseline_distribution = {
-            'predictions': predictions,
-            'labels': labels,
+            'size': len(predictions),
+            'label_counts': np.bincount(np.asarray(labels, dtype=np.int64).ravel()),
             'mean': np.mean(predictions, axis=0),
             'std': np.std(predictions, axis=0),
+            'class_counts': np.bincount(np.argmax(matrix, axis=1), minlength=matrix.shape[1]),
+            'histogram': drift_metrics.histogram(matrix.T, self.n_bins),
             'timestamp': datetime.utcnow()
         }
+        if self.streaming is not None:
+            self.streaming.set_baseline(predictions)
         logger.info("Baseline distribution set")
     
-    def detect_drift(self, current_predictions: np.ndarray) -> Dict:
+    def enable_streaming(self, n_classes: int = 38, n_bins: Optional[int] = None, window_buckets: int = 10):
+        """Track drift incrementally over sliding windows of window_size predictions"""
+        self.streaming = StreamingDriftDetector(
+            n_classes=n_classes,
+            n_bins=n_bins or self.n_bins,
+            bucket_size=max(1, self.window_size // window_buckets),
+            window_buckets=window_buckets
+        )
+        return self.streaming
+    
+    def update(self, predictions: np.ndarray):
+        """Feed one batch of predicted probabilities to the streaming drift detector"""
+        if self.streaming is None:
+            self.enable_streaming(n_classes=np.shape(predictions)[-1])
+        self.streaming.update(predictions)
+    
+    def _summarise_drift(self, per_class: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
         """
-        Detect distribution drift using multiple methods
+        Per-class metrics (..., classes) reduced to one value per leading index
+        
+        PSI, JS and Wasserstein are summarised by their maximum over classes
+        and the KS p-value by its Bonferroni-corrected minimum.
         """
-        if self.baseline_distribution is None:
-            logger.warning("Baseline not set, cannot detect drift")
-            return {'drift_detected': False}
+        n_classes = np.shape(per_class['ks_pvalue'])[-1]
+        summary = {
+            'psi': np.max(per_class['psi'], axis=-1),
+            'js_divergence': np.max(per_class['js_divergence'], axis=-1),
+            'wasserstein': np.max(per_class['wasserstein'], axis=-1),
+            'ks_statistic': np.max(per_class['ks_statistic'], axis=-1),
+            'ks_pvalue': np.minimum(1.0, np.min(per_class['ks_pvalue'], axis=-1) * n_classes)
+        }
+        summary['drift_detected'] = (
+            (summary['psi'] > self.drift_threshold) |
+            (summary['ks_pvalue'] < 0.05) |
+            (summary['js_divergence'] > 0.1)
+        )
+        return summary
+    
+    def _drift_report(self, per_class: Dict[str, np.ndarray]) -> Dict:
+        summary = self._summarise_drift(per_class)
+        psi = float(summary['psi'])
+        ks_pvalue = float(summary['ks_pvalue'])
+        js_divergence = float(summary['js_divergence'])
+        return {
+            'drift_detected': bool(summary['drift_detected']),
+            'psi': psi,
+            'ks_statistic': float(summary['ks_statistic']),
+            'ks_pvalue': ks_pvalue,
+            'js_divergence': js_divergence,
+            'wasserstein': float(summary['wasserstein']),
+            'timestamp': datetime.utcnow().isoformat(),
+            'severity': self._assess_drift_severity(psi, ks_pvalue, js_divergence)
+        }
+    
+    def detect_streaming_drift(self, reference: str = 'baseline') -> Dict:
+        """
+        Detect drift of the current streaming window
         
-        baseline_mean = self.baseline_distribution['mean']
-        baseline_std = self.baseline_distribution['std']
+        reference is 'baseline' or 'window' (the window before the current one).
+        """
+        comparison = self.streaming.compare(reference) if self.streaming is not None else None
+        if comparison is None:
+            return {'drift_detected': False, 'reason': 'Not enough data in the window or reference'}
         
-        current_mean = np.mean(current_predictions, axis=0)
-        current_std = np.std(current_predictions, axis=0)
+        drift_report = self._drift_report(comparison.pop('per_class'))
+        drift_report.update(comparison)
         
-        # 1. Population Stability Index (PSI)
-        psi = self._calculate_psi(baseline_mean, current_mean)
+        if drift_report['drift_detected']:
+            self._record_drift_alert(drift_report)
+            logger.warning(
+                f"Streaming drift detected against {reference}! "
+                f"PSI: {drift_report['psi']:.4f}, KS p-value: {drift_report['ks_pvalue']:.4f}"
+            )
         
-        # 2. Kolmogorov-Smirnov Test
-        ks_statistic, ks_pvalue = stats.ks_2samp(
-            baseline_mean.flatten(),
-            current_mean.flatten()
-        )
+        return drift_report
+    
+    def _record_drift_alert(self, drift_report: Dict):
+        self.drift_alerts.append(drift_report)
+        if len(self.drift_alerts) > MAX_DRIFT_ALERTS:
+            self.drift_alerts = self.drift_alerts[-MAX_DRIFT_ALERTS:]
+    
+    def detect_drift(self, current_predictions: np.ndarray) -> Dict:
+        """
+        Detect distribution drift of a prediction matrix against the baseline
         
-        # 3. Jensen-Shannon Divergence
-        js_divergence = self._calculate_js_divergence(baseline_mean, current_mean)
+        Each class probability is binned like the baseline, and PSI, KS, JS
+        and Wasserstein are computed for all classes in one vectorized call.
+        """
+        if self.baseline_distribution is None:
+            logger.warning("Baseline not set, cannot detect drift")
+            return {'drift_detected': False}
         
-        drift_detected = (
-            psi > self.drift_threshold or
-            ks_pvalue < 0.05 or
-            js_divergence > 0.1
+        baseline_histogram = self.baseline_distribution['histogram']
+        current_predictions = np.asarray(current_predictions)
+        current_histogram = drift_metrics.histogram(
+            current_predictions.reshape(len(current_predictions), -1).T, baseline_histogram.shape[-1]
         )
         
-        drift_report = {
-            'drift_detected': drift_detected,
-            'psi': float(psi),
-            'ks_statistic': float(ks_statistic),
-            'ks_pvalue': float(ks_pvalue),
-            'js_divergence': float(js_divergence),
-            'timestamp': datetime.utcnow().isoformat(),
-            'severity': self._assess_drift_severity(psi, ks_pvalue, js_divergence)
-        }
+        drift_report = self._drift_report(drift_metrics.drift_metrics(current_histogram, baseline_histogram))
         
-        if drift_detected:
-            self.drift_alerts.append(drift_report)
-            logger.warning(f"Drift detected! PSI: {psi:.4f}, KS p-value: {ks_pvalue:.4f}")
+        if drift_report['drift_detected']:
+            self._record_drift_alert(drift_report)
+            logger.warning(f"Drift detected! PSI: {drift_report['psi']:.4f}, KS p-value: {drift_report['ks_pvalue']:.4f}")
         
         return drift_report
     
-    def _calculate_psi(self, baseline: np.ndarray, current: np.ndarray) -> float:
-        """Calculate Population Stability Index"""
-        epsilon = 1e-10
-        psi = np.sum((current - baseline) * np.log((current + epsilon) / (baseline + epsilon)))
-        return abs(psi)
-    
-    def _calculate_js_divergence(self, p: np.ndarray, q: np.ndarray) -> float:
-        """Calculate Jensen-Shannon Divergence"""
-        epsilon = 1e-10
-        p = p + epsilon
-        q = q + epsilon
-        m = 0.5 * (p + q)
+    def backtest_drift(self, window_histograms: np.ndarray, reference: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Drift of many historical windows at once, e.g. a year of daily windows
         
-        kl_pm = np.sum(p * np.log(p / m))
-        kl_qm = np.sum(q * np.log(q / m))
+        window_histograms is (windows, classes, bins) probability histograms,
+        or (windows, classes) predicted-class counts to back-test the class
+        mix. Each window is compared with reference (the baseline histogram
+        by default) and the result holds one value per window; no alerts are
+        recorded. Class mixes are judged by PSI, JS and a chi-square test.
+        """
+        window_histograms = np.asarray(window_histograms)
+        if reference is None:
+            if self.baseline_distribution is None:
+                raise ValueError("Baseline not set and no reference given")
+            reference = self.baseline_distribution['class_counts' if window_histograms.ndim == 2 else 'histogram']
         
-        return 0.5 * (kl_pm + kl_qm)
+        if window_histograms.ndim == 2:
+            summary = drift_metrics.class_mix_metrics(window_histograms, reference)
+            summary['drift_detected'] = (
+                (summary['psi'] > self.drift_threshold) |
+                (summary['chi2_pvalue'] < 0.05) |
+                (summary['js_divergence'] > 0.1)
+            )
+            return summary
+        return self._summarise_drift(drift_metrics.drift_metrics(window_histograms, reference))
     
     def _assess_drift_severity(self, psi: float, ks_pvalue: float, js_div: float) -> str:
         """Assess drift severity level"""
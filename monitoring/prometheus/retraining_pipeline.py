@@ -5,7 +5,7 @@ Automated Retraining Pipeline with Validation
 import numpy as np
 from datetime import datetime
 import logging
-from typing import Dict
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -20,9 +20,15 @@ class RetrainingPipeline:
         self.data_dir = data_dir
         self.retraining_history = []
     
-    def trigger_retraining(self, new_data: Dict, validation_data: Dict) -> Dict:
+    def trigger_retraining(self, new_data: Dict, validation_data: Dict,
+                           base_model_path: Optional[str] = None,
+                           new_version: Optional[int] = None) -> Dict:
         """
         Trigger model retraining with new data
+        
+        Fine-tunes base_model_path (default model_path) and saves the result
+        as model_path.v<new_version>; callers running one pipeline per job
+        should pass a version claimed from the registry.
         """
         logger.info("Starting model retraining...")
         
@@ -30,7 +36,7 @@ class RetrainingPipeline:
             import tensorflow as tf
             
             # Load current model
-            model = tf.keras.models.load_model(self.model_path)
+            model = tf.keras.models.load_model(base_model_path or self.model_path)
             
             # Prepare training data
             X_new = np.array(new_data['images'])
@@ -70,7 +76,8 @@ class RetrainingPipeline:
             val_loss, val_accuracy = model.evaluate(X_val, y_val, verbose=0)
             
             # Save new model with version
-            new_version = len(self.retraining_history) + 1
+            if new_version is None:
+                new_version = len(self.retraining_history) + 1
             new_model_path = f"{self.model_path}.v{new_version}"
             model.save(new_model_path)
             
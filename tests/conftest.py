@@ -0,0 +1,49 @@
+"""
+Shared test setup
+"""
+import contextlib
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The backend reads its settings at import time: point it at a throwaway SQLite database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Replace the sync and async Redis clients with in-memory fakes sharing one server"""
+    fakeredis = pytest.importorskip("fakeredis")
+    import fakeredis.aioredis
+    from backend.core import cache
+
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(cache, "redis_client", client)
+    monkeypatch.setattr(cache, "async_redis_client", fakeredis.aioredis.FakeRedis(server=server))
+    return client
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Async context manager yielding a session factory bound to a fresh SQLite database"""
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    import backend.models  # noqa: F401 - registers every table
+    from backend.database import Base
+
+    @contextlib.asynccontextmanager
+    async def open_database():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            yield async_sessionmaker(engine, expire_on_commit=False)
+        finally:
+            await engine.dispose()
+
+    return open_database
@@ -0,0 +1,115 @@
+"""
+Unit tests for the incrementally maintained analytics rollups
+"""
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import PredictionLog, UserFeedback
+from backend.services import analytics_rollups
+
+CLASSES = ["Apple___Apple_scab", "Apple___healthy", "Tomato___Late_blight"]
+VERSIONS = ["1.0.0", "v1", None]
+
+
+def _logged_predictions(n: int, rng: random.Random) -> list:
+    start = datetime(2026, 1, 1)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": "user-1",
+            "timestamp": start + timedelta(minutes=i),
+            "model_version": rng.choice(VERSIONS),
+            "predicted_class": rng.choice(CLASSES),
+            "confidence": rng.random(),
+        }
+        for i in range(n)
+    ]
+
+
+def _feedback_on(rows: list, rng: random.Random) -> list:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "prediction_id": row["id"],
+            "user_id": "user-2",
+            # Roughly half the feedback confirms the prediction
+            "correct_class": row["predicted_class"] if rng.random() < 0.5 else rng.choice(CLASSES),
+        }
+        for row in rng.sample(rows, len(rows) // 3)
+    ]
+
+
+def _comparable(rollup: dict) -> dict:
+    rollup = dict(rollup)
+    rollup["mean_confidence"] = pytest.approx(rollup["mean_confidence"])
+    return rollup
+
+
+def test_incremental_rollups_match_a_rebuild(fake_redis, database):
+    rng = random.Random(7)
+    rows = _logged_predictions(300, rng)
+    feedback = _feedback_on(rows, rng)
+    by_id = {row["id"]: row for row in rows}
+
+    async def main():
+        async with database() as sessions:
+            async with sessions() as db:
+                db.add_all(PredictionLog(**row) for row in rows)
+                db.add_all(UserFeedback(**entry) for entry in feedback)
+                await db.commit()
+
+            # What the log writer and the feedback endpoints record as they go, in several batches
+            for start in range(0, len(rows), 64):
+                await analytics_rollups.record_predictions(rows[start:start + 64])
+            for entry in feedback[:10]:
+                prediction = by_id[entry["prediction_id"]]
+                await analytics_rollups.record_feedback(
+                    prediction["model_version"], prediction["predicted_class"], entry["correct_class"]
+                )
+            await analytics_rollups.record_feedbacks([
+                (by_id[e["prediction_id"]]["model_version"], by_id[e["prediction_id"]]["predicted_class"], e["correct_class"])
+                for e in feedback[10:]
+            ])
+
+            versions = await analytics_rollups.get_rollup_versions()
+            incremental = {version: await analytics_rollups.get_rollup(version) for version in versions}
+
+            async with sessions() as db:
+                rebuilt_versions = await analytics_rollups.rebuild_rollups(db)
+            rebuilt = {version: await analytics_rollups.get_rollup(version) for version in rebuilt_versions}
+            return incremental, rebuilt
+
+    incremental, rebuilt = asyncio.run(main())
+    assert sorted(incremental) == sorted(rebuilt) == ["1.0.0", analytics_rollups.UNKNOWN_VERSION, "v1"]
+    for version, rollup in rebuilt.items():
+        assert _comparable(incremental[version]) == rollup
+    assert sum(r["total_predictions"] for r in rebuilt.values()) == len(rows)
+    assert sum(r["user_feedbacks"] for r in rebuilt.values()) == len(feedback)
+
+
+def test_record_feedbacks_returns_each_version_count(fake_redis):
+    async def main():
+        await analytics_rollups.record_feedbacks([("1.0.0", "Apple___healthy", "Apple___healthy")] * 3)
+        return await analytics_rollups.record_feedbacks([
+            ("1.0.0", "Apple___healthy", "Apple___Apple_scab"),
+            ("v1", "Apple___healthy", "Apple___healthy"),
+        ])
+
+    assert asyncio.run(main()) == {"1.0.0": 4, "v1": 1}
+
+
+def test_rebuild_drops_versions_no_longer_in_the_database(fake_redis, database):
+    async def main():
+        async with database() as sessions:
+            await analytics_rollups.record_predictions([
+                {"model_version": "stale", "predicted_class": "Apple___healthy", "confidence": 0.9}
+            ])
+            async with sessions() as db:
+                await analytics_rollups.rebuild_rollups(db)
+            return await analytics_rollups.get_rollup_versions()
+
+    assert asyncio.run(main()) == []
@@ -0,0 +1,109 @@
+"""
+Unit tests for bulk feedback submission
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from backend.api import feedback
+from backend.models import PredictionLog, UserFeedback
+from backend.schemas.feedback import BulkFeedbackRequest
+from backend.services import analytics_rollups
+
+SCAB, HEALTHY, BLIGHT = "Apple___Apple_scab", "Apple___healthy", "Tomato___Late_blight"
+
+
+def _logs():
+    return [
+        PredictionLog(id="p1", user_id="user-1", timestamp=datetime(2026, 1, 1), model_version="1.0.0",
+                      predicted_class=SCAB, confidence=0.9),
+        PredictionLog(id="p2", user_id="user-1", timestamp=datetime(2026, 1, 1), model_version="v1",
+                      predicted_class=HEALTHY, confidence=0.8),
+    ]
+
+
+@pytest.fixture
+def retraining_jobs(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(feedback, "submit_retraining_job", lambda version, count: jobs.append((version, count)))
+    return jobs
+
+
+def _submit(database, items):
+    async def main():
+        async with database() as sessions:
+            async with sessions() as db:
+                db.add_all(_logs())
+                await db.commit()
+            async with sessions() as db:
+                response = await feedback.submit_bulk_feedback(
+                    BulkFeedbackRequest(items=items), user_id="reviewer", db=db
+                )
+            async with sessions() as db:
+                corrected = dict((await db.execute(select(PredictionLog.id, PredictionLog.corrected_class))).all())
+                feedback_rows = (await db.execute(select(func.count()).select_from(UserFeedback))).scalar_one()
+            return response, corrected, feedback_rows
+
+    return asyncio.run(main())
+
+
+def test_bulk_feedback_updates_known_predictions_and_reports_unknown_ids(fake_redis, database, retraining_jobs):
+    response, corrected, feedback_rows = _submit(database, [
+        {"prediction_id": "p1", "correct_class": HEALTHY},
+        {"prediction_id": "missing", "correct_class": BLIGHT},
+        {"prediction_id": "p2", "correct_class": HEALTHY},
+        # A later correction of the same prediction wins
+        {"prediction_id": "p1", "correct_class": BLIGHT},
+    ])
+
+    assert response.updated_predictions == 2
+    assert response.unknown_prediction_ids == ["missing"]
+    assert len(response.feedback_ids) == len(set(response.feedback_ids)) == 4
+    # Every item is kept as feedback, even those whose prediction is unknown
+    assert feedback_rows == 4
+    assert corrected == {"p1": BLIGHT, "p2": HEALTHY}
+
+    # Rollups count the feedbacks on known predictions against their version and predicted class
+    v0 = asyncio.run(analytics_rollups.get_rollup("1.0.0"))
+    v1 = asyncio.run(analytics_rollups.get_rollup("v1"))
+    assert (v0["user_feedbacks"], v0["correct_feedbacks"]) == (2, 0)
+    assert (v1["user_feedbacks"], v1["correct_feedbacks"]) == (1, 1)
+    assert retraining_jobs == []
+
+
+def test_bulk_feedback_triggers_retraining_at_the_threshold(fake_redis, database, retraining_jobs, monkeypatch):
+    monkeypatch.setattr(feedback, "RETRAINING_THRESHOLD", 2)
+    _submit(database, [
+        {"prediction_id": "p1", "correct_class": HEALTHY},
+        {"prediction_id": "p1", "correct_class": BLIGHT},
+        {"prediction_id": "p2", "correct_class": HEALTHY},
+    ])
+
+    assert retraining_jobs == [("1.0.0", 2)]
+
+
+def test_bulk_feedback_rejects_unknown_classes_without_writing(fake_redis, database, retraining_jobs):
+    async def main():
+        async with database() as sessions:
+            async with sessions() as db:
+                db.add_all(_logs())
+                await db.commit()
+            async with sessions() as db:
+                with pytest.raises(HTTPException) as error:
+                    await feedback.submit_bulk_feedback(BulkFeedbackRequest(items=[
+                        {"prediction_id": "p1", "correct_class": HEALTHY},
+                        {"prediction_id": "p2", "correct_class": "Not_a_class"},
+                    ]), user_id="reviewer", db=db)
+            async with sessions() as db:
+                corrected = (await db.execute(select(PredictionLog.corrected_class))).scalars().all()
+                feedback_rows = (await db.execute(select(func.count()).select_from(UserFeedback))).scalar_one()
+            return error.value, corrected, feedback_rows
+
+    error, corrected, feedback_rows = asyncio.run(main())
+    assert error.status_code == 422
+    assert error.detail["items"] == [{"index": 1, "correct_class": "Not_a_class"}]
+    assert corrected == [None, None]
+    assert feedback_rows == 0
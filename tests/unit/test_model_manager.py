@@ -0,0 +1,238 @@
+"""
+Unit tests for the micro-batching InferenceScheduler and inference backends
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from backend.services.model_service import InferenceScheduler, SchedulerStoppedError, TFLiteBackend, padded_batch_sizes
+
+
+class RecordingModel:
+    """Stand-in model that doubles its input and records every batch size"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            self.batch_sizes.append(len(batch))
+        if self.delay:
+            time.sleep(self.delay)
+        return batch.reshape(len(batch), -1).sum(axis=1, keepdims=True) * 2
+
+
+def tensor(value: float) -> np.ndarray:
+    return np.full((2, 2, 1), value, dtype=np.float32)
+
+
+def test_concurrent_requests_share_batches():
+    model = RecordingModel()
+    scheduler = InferenceScheduler(model, max_batch_size=4, max_wait_ms=500)
+    try:
+        futures = [scheduler.submit(tensor(i)) for i in range(8)]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        scheduler.stop(timeout=5)
+
+    assert model.batch_sizes == [4, 4]
+    # Every caller gets its own row back
+    assert [float(result[0]) for result in results] == [i * 4 * 2 for i in range(8)]
+
+
+def test_partial_batch_flushes_on_timeout():
+    model = RecordingModel()
+    scheduler = InferenceScheduler(model, max_batch_size=64, max_wait_ms=20)
+    try:
+        started = time.monotonic()
+        futures = [scheduler.submit(tensor(1)) for _ in range(3)]
+        for future in futures:
+            future.result(timeout=5)
+        elapsed = time.monotonic() - started
+    finally:
+        scheduler.stop(timeout=5)
+
+    assert model.batch_sizes == [3]
+    assert elapsed < 2
+
+
+def test_stop_drains_queued_requests():
+    model = RecordingModel(delay=0.05)
+    scheduler = InferenceScheduler(model, max_batch_size=2, max_wait_ms=1)
+    futures = [scheduler.submit(tensor(i)) for i in range(6)]
+    scheduler.stop(timeout=5)
+
+    assert all(future.done() for future in futures)
+    assert sum(model.batch_sizes) == 6
+    assert scheduler._thread is None
+
+
+def test_stop_without_work_is_a_noop():
+    scheduler = InferenceScheduler(RecordingModel())
+    assert scheduler.stop(timeout=1)
+    assert scheduler.stop(timeout=1)
+
+
+def test_submit_after_stop_fails_without_restarting():
+    model = RecordingModel()
+    scheduler = InferenceScheduler(model, max_wait_ms=1)
+    assert scheduler.submit(tensor(1)).result(timeout=5) == 8
+    assert scheduler.stop(timeout=5)
+
+    threads = threading.active_count()
+    future = scheduler.submit(tensor(2))
+    with pytest.raises(SchedulerStoppedError):
+        future.result(timeout=1)
+    with pytest.raises(SchedulerStoppedError):
+        scheduler.start()
+    assert scheduler._thread is None
+    assert threading.active_count() == threads
+    assert model.batch_sizes == [1]
+
+
+def test_submits_racing_stop_are_either_run_or_rejected():
+    model = RecordingModel()
+    scheduler = InferenceScheduler(model, max_batch_size=4, max_wait_ms=1)
+    futures = []
+    started, stopped = threading.Event(), threading.Event()
+    before = set(threading.enumerate())
+
+    def client():
+        # Keep submitting across the stop, and a little after it
+        while not stopped.is_set() or len(futures) < 20:
+            futures.append(scheduler.submit(tensor(len(futures))))
+            started.set()
+        for i in range(10):
+            futures.append(scheduler.submit(tensor(i)))
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    started.wait()
+    assert scheduler.stop(timeout=5)
+    stopped.set()
+    thread.join()
+
+    # Everything queued before the stop ran; nothing after it started a new thread
+    assert not [t for t in set(threading.enumerate()) - before if t.name == "inference-scheduler"]
+    for future in futures:
+        assert future.done()
+    ran = [future for future in futures if future.exception(timeout=0) is None]
+    assert sum(model.batch_sizes) == len(ran)
+    assert all(isinstance(future.exception(timeout=0), SchedulerStoppedError) for future in futures[len(ran):])
+
+
+def test_model_error_fails_every_request_in_the_batch():
+    def failing(batch):
+        raise ValueError("broken model")
+
+    scheduler = InferenceScheduler(failing, max_batch_size=4, max_wait_ms=200)
+    try:
+        futures = [scheduler.submit(tensor(i)) for i in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError, match="broken model"):
+                future.result(timeout=5)
+    finally:
+        scheduler.stop(timeout=5)
+
+
+def test_cancelled_requests_are_skipped():
+    gate = threading.Event()
+    model = RecordingModel()
+
+    def blocking(batch):
+        gate.wait(5)
+        return model(batch)
+
+    scheduler = InferenceScheduler(blocking, max_batch_size=1, max_wait_ms=0)
+    try:
+        first = scheduler.submit(tensor(0))
+        time.sleep(0.05)
+        second = scheduler.submit(tensor(1))
+        assert second.cancel()
+        gate.set()
+        first.result(timeout=5)
+    finally:
+        scheduler.stop(timeout=5)
+
+    assert model.batch_sizes == [1]
+
+
+def test_executor_batches_accumulate_while_slots_are_busy():
+    model = RecordingModel(delay=0.1)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        scheduler = InferenceScheduler(
+            model, max_batch_size=16, max_wait_ms=0, executor=executor, max_concurrent_batches=1
+        )
+        try:
+            first = scheduler.submit(tensor(0))
+            time.sleep(0.02)
+            # These queue up while the first batch holds the only slot
+            rest = [scheduler.submit(tensor(i)) for i in range(1, 6)]
+            for future in [first] + rest:
+                future.result(timeout=5)
+        finally:
+            scheduler.stop(timeout=5)
+
+    assert model.batch_sizes == [1, 5]
+
+
+class FakeInterpreter:
+    """Stand-in for tf.lite.Interpreter whose model sums each input row"""
+
+    allocations = 0
+
+    def __init__(self, model_content=None, num_threads=None):
+        self._shape = (1, 2, 2, 1)
+        self._input = None
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array(self._shape), "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array((self._shape[0], 1)), "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def resize_tensor_input(self, index, shape):
+        self._shape = tuple(shape)
+
+    def allocate_tensors(self):
+        FakeInterpreter.allocations += 1
+
+    def set_tensor(self, index, value):
+        assert value.shape == self._shape
+        self._input = value.copy()
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        return self._input.reshape(len(self._input), -1).sum(axis=1, keepdims=True)
+
+
+def test_padded_batch_sizes():
+    assert padded_batch_sizes(32) == [1, 2, 4, 8, 16, 32]
+    assert padded_batch_sizes(24) == [1, 2, 4, 8, 16, 24]
+    assert padded_batch_sizes(1) == [1]
+
+
+def test_tflite_pads_batches_and_allocates_once_per_size(tmp_path, monkeypatch):
+    model_path = tmp_path / "model.tflite"
+    model_path.write_bytes(b"flatbuffer")
+    monkeypatch.setattr(FakeInterpreter, "allocations", 0)
+    backend = TFLiteBackend(str(model_path), max_batch_size=8)
+    monkeypatch.setattr(backend, "_create_interpreter", FakeInterpreter)
+    backend.load()
+
+    for _ in range(3):
+        for n in range(1, 12):
+            batch = np.stack([tensor(i) for i in range(n)])
+            output = backend.predict_batch(batch)
+            assert output.shape == (n, 1)
+            assert output[:, 0].tolist() == [i * 4 for i in range(n)]
+
+    # One allocation per padded size (1, 2, 4, 8), however many batch sizes were seen
+    assert FakeInterpreter.allocations == 4
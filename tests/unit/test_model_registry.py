@@ -0,0 +1,116 @@
+"""
+Unit tests for ModelRegistry hot swaps
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from backend.config import MODEL_VERSION
+from backend.services import model_service
+from backend.services.model_registry import ModelRegistry, claim_artifact_number, list_model_artifacts
+from backend.services.model_service import InferenceBackend, LoadedModel, ModelManager
+from backend.services.preprocessing import INPUT_SHAPE
+
+
+class FileClassBackend(InferenceBackend):
+    """Predicts the class index written in its artifact; loads wait for load_gate"""
+
+    name = "file_class"
+    load_gate = None
+    predict_gate = None
+
+    def load(self):
+        if self.load_gate is not None:
+            self.load_gate.wait(5)
+        with open(self.model_path) as f:
+            self.class_index = int(f.read())
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        if self.predict_gate is not None:
+            self.predict_gate.wait(5)
+        probabilities = np.full((len(batch), len(model_service.CLASS_NAMES)), 0.001, dtype=np.float32)
+        probabilities[:, self.class_index] = 0.9
+        return probabilities
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    base = tmp_path / "model.bin"
+    base.write_text("0")
+    (tmp_path / "model.bin.v1").write_text("1")
+    monkeypatch.setitem(model_service.BACKENDS, FileClassBackend.name, (FileClassBackend, str(base)))
+    monkeypatch.setattr(FileClassBackend, "load_gate", None)
+    monkeypatch.setattr(FileClassBackend, "predict_gate", None)
+
+    manager = ModelManager()
+    backend = FileClassBackend(str(base))
+    backend.load()
+    manager.swap(LoadedModel(MODEL_VERSION, backend))
+    registry = ModelRegistry(manager, backend_name=FileClassBackend.name, keep=1)
+    registry.register_active()
+    yield registry
+    registry.close()
+
+
+def test_live_inference_continues_during_a_deploy(registry, monkeypatch):
+    manager = registry.model_manager
+    release = threading.Event()
+    monkeypatch.setattr(FileClassBackend, "load_gate", release)
+
+    async def main():
+        deploy = asyncio.ensure_future(registry.deploy("v1"))
+        await asyncio.sleep(0.05)
+        # The load is stuck, yet the active version still answers through the inference pool
+        predicted_class, _, _ = await asyncio.wait_for(
+            manager.predict_tensor_async(np.zeros(INPUT_SHAPE, dtype=np.float32)), timeout=2
+        )
+        assert not deploy.done()
+        release.set()
+        await asyncio.wait_for(deploy, timeout=5)
+        return predicted_class
+
+    assert asyncio.run(main()) == model_service.CLASS_NAMES[0]
+    assert manager.model_version == "v1"
+
+
+def test_deploy_evicts_and_stops_the_previous_version(registry):
+    previous = registry.model_manager.active
+    asyncio.run(registry.deploy("v1"))
+
+    assert registry.status()["resident"][0]["version"] == "v1"
+    assert len(registry.status()["resident"]) == 1
+    assert previous.scheduler._thread is None
+
+
+def test_unload_gives_up_after_the_timeout(registry, monkeypatch):
+    loaded = registry.model_manager.active
+    stuck = threading.Event()
+    monkeypatch.setattr(FileClassBackend, "predict_gate", stuck)
+    future = loaded.scheduler.submit(np.zeros(INPUT_SHAPE, dtype=np.float32))
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    registry._unload(loaded, timeout=0.1)
+    assert time.monotonic() - started < 2
+
+    stuck.set()
+    assert future.result(timeout=5).shape == (len(model_service.CLASS_NAMES),)
+
+
+def test_artifact_numbers_follow_disk_and_are_claimed_once(tmp_path, fake_redis):
+    base = tmp_path / "model.keras"
+    base.write_text("0")
+    (tmp_path / "model.keras.v1").write_text("1")
+    (tmp_path / "model.keras.v3").write_text("3")
+
+    assert list_model_artifacts(str(base)) == {
+        MODEL_VERSION: str(base),
+        "v1": str(tmp_path / "model.keras.v1"),
+        "v3": str(tmp_path / "model.keras.v3"),
+    }
+    # Two jobs claiming before either has saved get distinct numbers
+    assert claim_artifact_number(str(base)) == 4
+    assert claim_artifact_number(str(base)) == 5
@@ -0,0 +1,115 @@
+"""
+Unit tests for the vectorized drift metrics and their use in ModelMonitor
+"""
+import numpy as np
+import pytest
+from scipy import stats
+from scipy.spatial.distance import jensenshannon
+
+from monitoring.prometheus import drift_metrics
+from monitoring.prometheus.model_monitor import ModelMonitor
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(11)
+
+
+def test_histogram_matches_numpy_row_by_row(rng):
+    values = rng.random((3, 4, 500))
+    counts = drift_metrics.histogram(values, bins=10)
+    for index in np.ndindex(values.shape[:-1]):
+        expected, _ = np.histogram(values[index], bins=10, range=(0.0, 1.0))
+        np.testing.assert_array_equal(counts[index], expected)
+
+
+def test_ks_samples_matches_scipy(rng):
+    current = rng.normal(0.0, 1.0, (4, 3, 200))
+    reference = rng.normal(0.3, 1.2, (4, 3, 150))
+    # Ties between and within samples
+    current[0, 0, :50] = 0.5
+    reference[0, 0, :20] = 0.5
+
+    statistic = drift_metrics.ks_samples(current, reference)
+    for index in np.ndindex(current.shape[:-1]):
+        assert statistic[index] == pytest.approx(stats.ks_2samp(current[index], reference[index]).statistic)
+
+
+def test_binned_ks_matches_scipy_on_binned_samples(rng):
+    bins = 20
+    current = rng.integers(0, bins, (5, 400))
+    reference = rng.integers(0, bins, 300)
+    current_counts = np.stack([np.bincount(row, minlength=bins) for row in current])
+    reference_counts = np.bincount(reference, minlength=bins)
+
+    statistic = drift_metrics.ks_statistic(current_counts, reference_counts)
+    for row, value in zip(current, statistic):
+        assert value == pytest.approx(stats.ks_2samp(row, reference).statistic)
+
+
+def test_js_divergence_matches_scipy(rng):
+    current = rng.integers(1, 100, (6, 20))
+    reference = rng.integers(1, 100, 20)
+
+    divergence = drift_metrics.js_divergence(current, reference, epsilon=0.0)
+    for row, value in zip(current, divergence):
+        # scipy returns the distance, the square root of the divergence
+        assert value == pytest.approx(jensenshannon(row, reference) ** 2)
+    assert np.all(divergence <= np.log(2))
+
+
+def test_psi_matches_a_reference_loop(rng):
+    current = rng.integers(0, 50, (6, 20))
+    reference = rng.integers(0, 50, 20)
+
+    value = drift_metrics.psi(current, reference)
+    q = (reference / reference.sum() + drift_metrics.EPSILON) / (1 + drift_metrics.EPSILON * 20)
+    for row, got in zip(current, value):
+        p = (row / row.sum() + drift_metrics.EPSILON) / (1 + drift_metrics.EPSILON * 20)
+        expected = sum((pi - qi) * np.log(pi / qi) for pi, qi in zip(p, q))
+        assert got == pytest.approx(expected)
+
+
+def test_chi_square_matches_scipy_and_skips_empty_classes(rng):
+    current = rng.integers(0, 60, (5, 8))
+    reference = rng.integers(0, 60, 8)
+    current[:, 2] = 0
+    reference[2] = 0
+
+    statistic, pvalue = drift_metrics.chi_square(current, reference)
+    for row, got_statistic, got_pvalue in zip(current, statistic, pvalue):
+        table = np.stack([row, reference])[:, [0, 1, 3, 4, 5, 6, 7]]
+        expected = stats.chi2_contingency(table, correction=False)
+        assert got_statistic == pytest.approx(expected.statistic)
+        assert got_pvalue == pytest.approx(expected.pvalue)
+
+
+def test_class_mix_metrics_ignore_class_numbering(rng):
+    current = rng.integers(0, 100, (4, 38))
+    reference = rng.integers(0, 100, 38)
+    order = rng.permutation(38)
+
+    metrics = drift_metrics.class_mix_metrics(current, reference)
+    permuted = drift_metrics.class_mix_metrics(current[:, order], reference[order])
+    assert set(metrics) == {'psi', 'js_divergence', 'chi2_statistic', 'chi2_pvalue'}
+    for name in metrics:
+        np.testing.assert_allclose(metrics[name], permuted[name])
+
+
+def test_backtest_judges_class_mix_without_ordered_metrics(rng):
+    monitor = ModelMonitor()
+    baseline = rng.dirichlet(np.ones(5), 2000)
+    monitor.set_baseline(baseline, np.argmax(baseline, axis=1))
+
+    reference = monitor.baseline_distribution['class_counts']
+    steady = np.round(reference / reference.sum() * 1000).astype(np.int64)
+    shifted = steady.copy()
+    shifted[0], shifted[4] = shifted[0] + 300, max(shifted[4] - 300, 0)
+
+    summary = monitor.backtest_drift(np.stack([steady, shifted]))
+    assert 'ks_pvalue' not in summary and 'wasserstein' not in summary
+    assert summary['drift_detected'].tolist() == [False, True]
+
+    # Probability histograms keep KS and Wasserstein
+    window = monitor.baseline_distribution['histogram'][None]
+    assert {'ks_pvalue', 'wasserstein'} <= set(monitor.backtest_drift(window))
@@ -0,0 +1,192 @@
+"""
+Unit tests for the content-addressed prediction cache and request coalescing
+"""
+import asyncio
+import io
+from types import SimpleNamespace
+
+import orjson
+from fastapi import UploadFile
+
+from backend.api import predictions
+from backend.core.cache import SingleFlight, content_hash, pack, unpack
+from backend.schemas.prediction import PredictionRequest
+from backend.services.model_service import ModelManager
+
+
+def options(**kwargs) -> PredictionRequest:
+    return PredictionRequest(**kwargs)
+
+
+def test_cache_key_ignores_request_metadata():
+    image_hash = content_hash(b"leaf")
+    north = predictions._cache_key(image_hash, "1.0.0", options(metadata={"region": "north"}))
+    south = predictions._cache_key(image_hash, "1.0.0", options(metadata={"region": "south"}))
+    assert north == south
+
+
+def test_cache_key_covers_image_version_and_response_options():
+    image_hash = content_hash(b"leaf")
+    base = predictions._cache_key(image_hash, "1.0.0", options())
+    assert predictions._cache_key(content_hash(b"other leaf"), "1.0.0", options()) != base
+    assert predictions._cache_key(image_hash, "1.1.0", options()) != base
+    assert predictions._cache_key(image_hash, "1.0.0", options(include_treatment=False)) != base
+    assert predictions._cache_key(image_hash, "1.0.0", options(include_explainability=True)) != base
+    assert predictions._cache_key(image_hash, "1.0.0", options(probability_format="array")) != base
+    top_3 = predictions._cache_key(image_hash, "1.0.0", options(probability_format="top_k", top_k=3))
+    top_5 = predictions._cache_key(image_hash, "1.0.0", options(probability_format="top_k", top_k=5))
+    assert top_3 != top_5
+
+
+def test_cache_key_clamps_top_k_to_the_class_count():
+    image_hash = content_hash(b"leaf")
+    every_class = options(probability_format="top_k", top_k=len(predictions.CLASS_NAMES))
+    too_many = options(probability_format="top_k", top_k=500)
+    assert predictions._cache_key(image_hash, "1.0.0", too_many) == predictions._cache_key(image_hash, "1.0.0", every_class)
+
+
+def test_cached_output_keeps_the_serialized_response_fields():
+    output = _cached_output()
+    restored = unpack(pack(output))
+    # The shared fields come back as the same JSON bytes, ready to splice into a response
+    assert restored["body"] == output["body"]
+    assert orjson.loads(restored["body"])["all_probabilities"] == {"Tomato___Early_blight": 0.93}
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"predicted_class": "Tomato___healthy"}
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        # Once finished, the next call runs the work again
+        await flight.do("key", work)
+        return results
+
+    results = asyncio.run(main())
+    assert len(calls) == 2
+    assert all(result is results[0] for result in results)
+
+
+def test_single_flight_survives_a_cancelled_caller():
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+class RecordingLogWriter:
+    def __init__(self):
+        self.rows = []
+
+    async def submit(self, row: dict):
+        self.rows.append(row)
+
+    async def submit_many(self, rows: list):
+        self.rows.extend(rows)
+
+
+def _cached_output() -> dict:
+    return predictions._model_output(
+        "Tomato___Early_blight", 0.93, {"Tomato___Early_blight": 0.93}, None, None, options()
+    )
+
+
+def _predict(metadata: str, user_id: str) -> dict:
+    upload = UploadFile(file=io.BytesIO(b"same image bytes"), filename="leaf.jpg")
+    response = asyncio.run(predictions.predict_disease(
+        file=upload,
+        metadata=metadata,
+        include_explainability=False,
+        explainability_mode="sync",
+        include_treatment=True,
+        probability_format="dict",
+        top_k=5,
+        user_id=user_id
+    ))
+    return orjson.loads(response.body)
+
+
+def test_cache_hits_get_their_own_id_metadata_and_log_row(monkeypatch):
+    manager = ModelManager()
+    manager.active = SimpleNamespace(version="1.0.0")
+    writer = RecordingLogWriter()
+    output = _cached_output()
+
+    async def cache_get(key):
+        return output
+
+    monkeypatch.setattr(predictions, "get_model_manager", lambda: manager)
+    monkeypatch.setattr(predictions, "get_prediction_log_writer", lambda: writer)
+    monkeypatch.setattr(predictions, "cache_get", cache_get)
+
+    first = _predict('{"region": "north", "farmer": "a"}', "user-1")
+    second = _predict('{"region": "south", "farmer": "b"}', "user-2")
+
+    assert first["prediction_id"] != second["prediction_id"]
+    assert first["predicted_class"] == second["predicted_class"] == "Tomato___Early_blight"
+    assert second["all_probabilities"] == {"Tomato___Early_blight": 0.93}
+    assert second["severity"] == "severe"
+    assert second["metadata"]["region"] == "south"
+    assert second["metadata"]["farmer"] == "b"
+    assert [row["id"] for row in writer.rows] == [first["prediction_id"], second["prediction_id"]]
+    assert [row["user_id"] for row in writer.rows] == ["user-1", "user-2"]
+    assert writer.rows[1]["metadata"] == {"region": "south", "farmer": "b"}
+    # The cached output itself is never modified
+    assert "prediction_id" not in output
+
+
+def test_coalesced_callers_get_their_own_id_and_log_row(monkeypatch):
+    manager = ModelManager()
+    manager.active = SimpleNamespace(version="1.0.0")
+    writer = RecordingLogWriter()
+    runs = []
+
+    async def cache_get(key):
+        return None
+
+    async def compute_output(*args):
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return _cached_output()
+
+    monkeypatch.setattr(predictions, "get_model_manager", lambda: manager)
+    monkeypatch.setattr(predictions, "get_prediction_log_writer", lambda: writer)
+    monkeypatch.setattr(predictions, "cache_get", cache_get)
+    monkeypatch.setattr(predictions, "_compute_output", compute_output)
+
+    async def main():
+        uploads = [UploadFile(file=io.BytesIO(b"same image bytes"), filename="leaf.jpg") for _ in range(3)]
+        return await asyncio.gather(*(
+            predictions.predict_disease(
+                file=upload,
+                metadata=f'{{"farmer": "{i}"}}',
+                include_explainability=False,
+                explainability_mode="sync",
+                include_treatment=True,
+                probability_format="dict",
+                top_k=5,
+                user_id=f"user-{i}"
+            )
+            for i, upload in enumerate(uploads)
+        ))
+
+    bodies = [orjson.loads(response.body) for response in asyncio.run(main())]
+    assert len(runs) == 1
+    assert len({body["prediction_id"] for body in bodies}) == 3
+    assert [body["metadata"]["farmer"] for body in bodies] == ["0", "1", "2"]
+    assert sorted(row["user_id"] for row in writer.rows) == ["user-0", "user-1", "user-2"]
@@ -0,0 +1,124 @@
+"""
+Unit tests for the TF Serving REST client against a stand-in :predict server
+"""
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from backend.config import TF_SERVING_MODEL_NAME, TF_SERVING_SIGNATURE
+from backend.services.model_service import TFServingBackend
+
+N_CLASSES = 4
+
+
+class StandInServing(BaseHTTPRequestHandler):
+    """Answers /v1/models/<name> and /v1/models/<name>:predict like TF Serving"""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+    output_key = None
+    status = 200
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != f"/v1/models/{TF_SERVING_MODEL_NAME}":
+            return self._send(404, {"error": "unknown model"})
+        self._send(200, {"model_version_status": [{"version": "1", "state": "AVAILABLE"}]})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append((self.path, body))
+        if self.status != 200:
+            return self._send(self.status, {"error": "model overloaded"})
+        # One-hot on the first pixel value, so each row can be traced back to its image
+        outputs = []
+        for item in body["inputs"]["image_bytes"]:
+            pixels = np.frombuffer(base64.b64decode(item["b64"]), dtype=np.uint8)
+            row = [0.0] * N_CLASSES
+            row[int(pixels[0]) % N_CLASSES] = 1.0
+            outputs.append(row)
+        self._send(200, {"outputs": {self.output_key: outputs} if self.output_key else outputs})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serving(monkeypatch):
+    monkeypatch.setattr(StandInServing, "requests", [])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInServing)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def loaded_backend(url: str) -> TFServingBackend:
+    backend = TFServingBackend(url)
+    backend.load()
+    return backend
+
+
+def test_sends_raw_uint8_pixels_as_base64(serving):
+    backend = loaded_backend(serving)
+    batch = np.random.default_rng(0).integers(0, 256, (3, 128, 128, 3), dtype=np.uint8)
+    backend.predict_batch(batch)
+
+    path, body = StandInServing.requests[-1]
+    assert path == f"/v1/models/{TF_SERVING_MODEL_NAME}:predict"
+    assert body["signature_name"] == TF_SERVING_SIGNATURE
+    images = body["inputs"]["image_bytes"]
+    assert len(images) == 3
+    for image, item in zip(batch, images):
+        decoded = np.frombuffer(base64.b64decode(item["b64"]), dtype=np.uint8).reshape(128, 128, 3)
+        np.testing.assert_array_equal(decoded, image)
+
+
+def test_float_batches_are_packed_back_to_pixels(serving):
+    backend = loaded_backend(serving)
+    batch = np.zeros((1, 128, 128, 3), dtype=np.float32)
+    batch[0, 0, 0, 0] = 3 / 255.0
+    backend.predict_batch(batch)
+
+    _, body = StandInServing.requests[-1]
+    pixels = np.frombuffer(base64.b64decode(body["inputs"]["image_bytes"][0]["b64"]), dtype=np.uint8)
+    assert pixels.size == 128 * 128 * 3
+    assert pixels[0] == 3
+
+
+@pytest.mark.parametrize("output_key", [None, "probabilities"])
+def test_parses_single_and_named_outputs(serving, monkeypatch, output_key):
+    monkeypatch.setattr(StandInServing, "output_key", output_key)
+    backend = loaded_backend(serving)
+    batch = np.zeros((4, 128, 128, 3), dtype=np.uint8)
+    batch[:, 0, 0, 0] = [0, 1, 2, 3]
+
+    probabilities = backend.predict_batch(batch)
+    assert probabilities.dtype == np.float32
+    assert probabilities.shape == (4, N_CLASSES)
+    assert np.argmax(probabilities, axis=1).tolist() == [0, 1, 2, 3]
+
+
+def test_error_responses_raise(serving, monkeypatch):
+    backend = loaded_backend(serving)
+    monkeypatch.setattr(StandInServing, "status", 400)
+    with pytest.raises(RuntimeError, match="400"):
+        backend.predict_batch(np.zeros((1, 128, 128, 3), dtype=np.uint8))
+
+
+def test_load_fails_when_the_model_is_not_served(serving, monkeypatch):
+    monkeypatch.setattr("backend.services.model_service.TF_SERVING_MODEL_NAME", "missing")
+    with pytest.raises(Exception):
+        loaded_backend(serving)
@@ -0,0 +1,241 @@
+"""
+Celery Tasks - Background work off the API request path
+
+Run with: celery -A workers.celery_tasks worker --loglevel=info
+"""
+import json
+import logging
+import uuid
+from typing import List, Optional
+
+import numpy as np
+from celery import Celery
+
+from backend.config import (
+    CLASS_NAMES, CELERY_BROKER_URL, CELERY_RESULT_BACKEND,
+    EXPLAINABILITY_HEATMAP_ENCODING, EXPLAINABILITY_JOB_TTL,
+    ANALYTICS_AGGREGATE_INTERVAL_SECONDS, MODEL_PATH, IMAGE_STORE_PATH,
+    PREDICTION_LOG_MAINTENANCE_SECONDS, LOG_EXPORT_INTERVAL_SECONDS
+)
+from backend.core.cache import get_redis_client
+from backend.services.explainability import explainability_payload
+from backend.services.image_store import get_image_store, load_images
+from backend.services.preprocessing import load_image_tensor
+
+logger = logging.getLogger(__name__)
+
+celery_app = Celery("plant_disease", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    # Grad-CAM jobs are heavy and uneven; take one at a time and ack once done
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    # Run by `celery beat` (see docker-compose.yml)
+    beat_schedule={
+        "aggregate-analytics": {
+            "task": "analytics.aggregate_predictions",
+            "schedule": float(ANALYTICS_AGGREGATE_INTERVAL_SECONDS)
+        },
+        "maintain-prediction-log-partitions": {
+            "task": "prediction_logs.maintain_partitions",
+            "schedule": float(PREDICTION_LOG_MAINTENANCE_SECONDS)
+        },
+        "export-logs": {
+            "task": "exports.export_logs",
+            "schedule": float(LOG_EXPORT_INTERVAL_SECONDS)
+        }
+    }
+)
+
+# Explainability jobs: the API records a pending status, a worker computes
+# the heatmap from the image store and overwrites the status with it
+EXPLAINABILITY_RESULT_KEY = "explainability:result:{job_id}"
+# The upload is written to the image store in the background, so a job can
+# arrive before its image; it is retried this many times, one second apart
+EXPLAINABILITY_INPUT_RETRIES = 10
+
+def submit_explainability_jobs(image_keys: List[str], model_version: str, predicted_classes: List[str]) -> List[str]:
+    """Enqueue one Grad-CAM job per stored image, returning the job ids"""
+    job_ids = [str(uuid.uuid4()) for _ in predicted_classes]
+    pipe = get_redis_client().pipeline(transaction=False)
+    for job_id, predicted_class in zip(job_ids, predicted_classes):
+        pipe.setex(
+            EXPLAINABILITY_RESULT_KEY.format(job_id=job_id),
+            EXPLAINABILITY_JOB_TTL,
+            json.dumps({
+                "job_id": job_id,
+                "status": "pending",
+                "model_version": model_version,
+                "predicted_class": predicted_class
+            })
+        )
+    pipe.execute()
+
+    for job_id, stored_key, predicted_class in zip(job_ids, image_keys, predicted_classes):
+        generate_explainability.delay(job_id, stored_key, model_version, predicted_class)
+    return job_ids
+
+def get_explainability_job(job_id: str) -> Optional[dict]:
+    """Current status of an explainability job, None if unknown or expired"""
+    result = get_redis_client().get(EXPLAINABILITY_RESULT_KEY.format(job_id=job_id))
+    return json.loads(result) if result else None
+
+def _set_job_result(job_id: str, result: dict):
+    get_redis_client().setex(
+        EXPLAINABILITY_RESULT_KEY.format(job_id=job_id),
+        EXPLAINABILITY_JOB_TTL,
+        json.dumps(result)
+    )
+
+# Keras models resident in this worker process, loaded on first use per version
+_worker_registry = None
+
+def get_worker_registry():
+    """Model registry of this worker; always Keras since Grad-CAM needs gradients"""
+    global _worker_registry
+    if _worker_registry is None:
+        from backend.services.model_registry import ModelRegistry
+        from backend.services.model_service import ModelManager
+        _worker_registry = ModelRegistry(ModelManager(), backend_name="keras")
+    return _worker_registry
+
+@celery_app.task(name="explainability.grad_cam", bind=True, ignore_result=True, max_retries=EXPLAINABILITY_INPUT_RETRIES)
+def generate_explainability(self, job_id: str, stored_key: str, model_version: str, predicted_class: str):
+    """Compute the Grad-CAM heatmap for a stored image"""
+    result = {"job_id": job_id, "model_version": model_version, "predicted_class": predicted_class}
+    store = get_image_store()
+    if not store.exists(stored_key) and self.request.retries < self.max_retries:
+        raise self.retry(countdown=1)
+    try:
+        with store.open(stored_key) as buffer:
+            image = load_image_tensor(buffer)[np.newaxis]
+
+        # Explain with the same version that made the prediction
+        loaded = get_worker_registry().activate(model_version)
+        heatmap = loaded.explain(image, [CLASS_NAMES.index(predicted_class)])[0]
+
+        result["status"] = "completed"
+        result["explainability"] = explainability_payload(heatmap, predicted_class, EXPLAINABILITY_HEATMAP_ENCODING)
+    except Exception as e:
+        logger.error(f"Explainability job {job_id} failed: {e}")
+        result["status"] = "failed"
+        result["error"] = str(e)
+
+    _set_job_result(job_id, result)
+
+# Held while an aggregation run is in progress so overlapping runs skip
+AGGREGATE_LOCK_KEY = "analytics:aggregates:lock"
+
+@celery_app.task(name="analytics.aggregate_predictions", ignore_result=True)
+def aggregate_analytics():
+    """Refresh the hourly and daily prediction aggregates"""
+    from backend.database import SessionLocal
+    from backend.services.analytics_aggregates import aggregate_predictions
+
+    client = get_redis_client()
+    if not client.set(AGGREGATE_LOCK_KEY, "1", nx=True, ex=max(ANALYTICS_AGGREGATE_INTERVAL_SECONDS * 10, 600)):
+        logger.info("Analytics aggregation already running, skipping")
+        return
+    try:
+        with SessionLocal() as db:
+            aggregate_predictions(db)
+    finally:
+        client.delete(AGGREGATE_LOCK_KEY)
+
+# Set once per model version when its retraining job is enqueued, holding the job id
+RETRAINING_TRIGGER_KEY = "retraining:triggered:{model_version}"
+RETRAINING_RESULT_KEY = "retraining:result:{model_version}"
+
+def submit_retraining_job(model_version: Optional[str], feedback_count: int) -> Optional[str]:
+    """
+    Enqueue retraining for a model version that reached the feedback threshold
+
+    Only the first caller claims the trigger key, so the job is enqueued
+    exactly once per version however many feedbacks arrive past the
+    threshold. Returns the job id, or None if it was already triggered.
+    """
+    model_version = model_version or "unknown"
+    job_id = str(uuid.uuid4())
+    key = RETRAINING_TRIGGER_KEY.format(model_version=model_version)
+    client = get_redis_client()
+    if not client.set(key, job_id, nx=True):
+        return None
+    try:
+        retrain_model.apply_async((model_version, feedback_count), task_id=job_id)
+    except Exception:
+        # Release the trigger so the next feedback tries again
+        client.delete(key)
+        raise
+    logger.info(f"Retraining threshold reached for model {model_version} ({feedback_count} feedbacks), job {job_id}")
+    return job_id
+
+@celery_app.task(name="retraining.retrain_model", ignore_result=True)
+def retrain_model(model_version: str, feedback_count: int):
+    """Fine-tune on the user-corrected predictions of a model version"""
+    from sqlalchemy import select
+    from backend.database import SessionLocal
+    from backend.models.prediction import PredictionLog
+    from backend.services.log_archive import read_archived_logs
+    from backend.services.model_registry import claim_artifact_number, list_model_artifacts
+    from monitoring.prometheus.retraining_pipeline import RetrainingPipeline
+
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(PredictionLog.image_path, PredictionLog.corrected_class).where(
+                PredictionLog.model_version == model_version,
+                PredictionLog.corrected_class.isnot(None),
+                PredictionLog.image_path.isnot(None)
+            )
+        ).all()
+    # Corrections on logs already moved out of Postgres
+    archived = read_archived_logs(
+        columns=["image_path", "corrected_class"],
+        filters=[("model_version", "=", model_version), ("corrected_class", "in", CLASS_NAMES)]
+    )
+    rows += zip(archived.column("image_path").to_pylist(), archived.column("corrected_class").to_pylist())
+    samples = [(key, CLASS_NAMES.index(label)) for key, label in rows if key and label in CLASS_NAMES]
+    if len(samples) < 2:
+        logger.warning(f"Not enough corrected samples to retrain model {model_version}")
+        return
+
+    # Hold out a fifth of the samples for validation
+    images = load_images([key for key, _ in samples])
+    labels = [label for _, label in samples]
+    split = max(1, len(samples) // 5)
+
+    # Fine-tune the version the feedback was given on, into the next free artifact
+    base_model_path = list_model_artifacts(MODEL_PATH).get(model_version)
+    if base_model_path is None:
+        logger.warning(f"No artifact for model {model_version}, retraining from {MODEL_PATH}")
+        base_model_path = MODEL_PATH
+    number = claim_artifact_number(MODEL_PATH)
+    result = RetrainingPipeline(MODEL_PATH, IMAGE_STORE_PATH).trigger_retraining(
+        {"images": images[split:], "labels": labels[split:]},
+        {"images": images[:split], "labels": labels[:split]},
+        base_model_path=base_model_path,
+        new_version=number
+    )
+    result.update({
+        "model_version": model_version,
+        "base_model_path": base_model_path,
+        "new_model_version": f"v{number}",
+        "feedback_count": feedback_count
+    })
+    get_redis_client().set(RETRAINING_RESULT_KEY.format(model_version=model_version), json.dumps(result))
+
+@celery_app.task(name="prediction_logs.maintain_partitions", ignore_result=True)
+def maintain_prediction_log_partitions():
+    """Create upcoming prediction_logs partitions and archive expired ones to Parquet"""
+    from backend.database import engine
+    from backend.services.log_archive import maintain_partitions
+
+    maintain_partitions(engine)
+
+@celery_app.task(name="exports.export_logs", ignore_result=True)
+def export_logs():
+    """Append prediction and feedback logs since the last run to the Parquet export"""
+    from backend.database import engine
+    from backend.services.log_export import export_logs as run_export
+
+    run_export(engine)